@@ -0,0 +1,123 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Classes for tracking the units of ingestion that failed.
+
+Module provides the ``DeadLetters`` class, a firestore collection with
+one document per (user, scope, date) that failed to ingest, with the
+class and message of the last error and the number of failures.
+
+the ingestion engine records a dead letter whenever fetching,
+transforming or loading the responses of a unit fails, and deletes it
+once the same unit is ingested completely.  the `/fitbit_retry_dead_letters` route re-runs
+just the failed units, see ``app.fitbit_ingest``.
+
+Configuration:
+
+    * `INGEST_DEAD_LETTER_DATASET`: optional, name of the firestore
+        collection used to store dead letters.  defaults to
+        `ingest_dead_letters`.
+"""
+import os
+import logging
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from .firestore_storage import db
+
+
+log = logging.getLogger(__name__)
+
+
+class DeadLetters:
+    """Firestore backend for failed (user, scope, date) units.
+
+    Examples of use::
+
+        dead_letters = DeadLetters("ingest_dead_letters")
+
+        dead_letters.load("intraday")
+        try:
+            ...
+        except (Exception) as e:
+            dead_letters.record(user, "intraday", date_pulled, e)
+        ...
+        dead_letters.clear(user, "intraday", date_pulled)
+
+    ``load`` caches the dead letters of a scope, so ``clear`` only
+    writes to firestore for units that did fail before.
+    """
+
+    def __init__(self, collection):
+
+        self.collection = db.collection(collection)
+        self._cache = {}
+
+    @staticmethod
+    def _key(user, scope, date_pulled):
+        return f"{scope}:{date_pulled}:{user}"
+
+    def load(self, scope=None):
+        """read the dead letters of scope (or all of them) from firestore
+
+        returns the documents as dicts.
+        """
+
+        query = self.collection
+        if scope:
+            query = query.where("scope", "==", scope)
+
+        letters = []
+        for doc in query.stream():
+            letter = doc.to_dict()
+            self._cache[doc.id] = letter
+            letters.append(letter)
+
+        return letters
+
+    def record(self, user, scope, date_pulled, error):
+        """the unit failed with the exception error"""
+
+        key = self._key(user, scope, date_pulled)
+        now = datetime.utcnow().isoformat()
+
+        letter = {
+            "user": user,
+            "scope": scope,
+            "date": date_pulled,
+            "error": type(error).__name__,
+            "message": str(error),
+            "failed_at": now,
+            "failures": firestore.Increment(1),
+        }
+        self.collection.document(key).set(letter, merge=True)
+
+        cached = self._cache.get(key, {})
+        letter["failures"] = cached.get("failures", 0) + 1
+        self._cache[key] = letter
+
+    def clear(self, user, scope, date_pulled):
+        """the unit was ingested, drop its dead letter if any"""
+
+        key = self._key(user, scope, date_pulled)
+        if key in self._cache:
+            self.collection.document(key).delete()
+            del self._cache[key]
+
+
+dead_letters_datasetname = os.environ.get("INGEST_DEAD_LETTER_DATASET")
+if not dead_letters_datasetname:
+    dead_letters_datasetname = "ingest_dead_letters"
+dead_letters = DeadLetters(dead_letters_datasetname)
@@ -43,23 +43,25 @@ Configuration:
         * `FIRESTORE_DATASET`: specifies the firestore dataset to use for
             storage of oauth tokens.
         * `BIGQUERY_DATASET`: dataset to use to store user data.
+        * `FITBIT_SUBSCRIBER_ID`: optional, id of the fitbit subscriber
+            pointing at `/fitbit_subscription`.  when set, registration
+            subscribes the user to notifications for all collections.
 
 .. _flask-dance:
     https://flask-dance.readthedocs.io/
 """
 import os
-from datetime import date
 import requests
 import logging
 
-import pandas as pd
-import pandas_gbq
-from skimpy import clean_columns
-
 from flask import Blueprint, redirect, url_for, session
 from flask_dance.contrib.fitbit import fitbit, make_fitbit_blueprint
 
 from .firestore_storage import FirestoreStorage
+from .ingest_state import ingest_state
+from .table_sink import make_sink
+from .fitbit_schemas import PROFILE_TABLE_SCHEMA
+from .fitbit_transform import profile_dataframe
 
 FITBIT_SCOPES = [
     "activity",
@@ -91,11 +93,8 @@ bp = Blueprint("fitbit_auth_bp", __name__)
 
 log = logging.getLogger(__name__)
 
-bigquery_datasetname = os.environ.get("BIGQUERY_DATASET")
-
-
-def _tablename(table: str) -> str:
-    return bigquery_datasetname + "." + table
+# subscriber notifications are delivered to, None to not subscribe users
+subscriber_id = os.environ.get("FITBIT_SUBSCRIBER_ID") or None
 
 
 @bp.route("/registration")
@@ -131,6 +130,17 @@ def device_registration():
             if resp.status_code == requests.codes.ok:
                 _export_profile_to_bigquery(username, resp.json()['user'])
 
+                # used to map notifications and schedule by local time
+                ingest_state.update(
+                    username,
+                    {
+                        "encoded_id": resp.json()["user"]["encodedId"],
+                        "timezone": resp.json()["user"]["timezone"],
+                    },
+                )
+
+                _create_subscription(resp.json()["user"]["encodedId"])
+
         except (Exception) as e:
             print("error" + e)
 
@@ -153,113 +163,36 @@ def device_delete():
     return redirect("/")
 
 
-def _normalize_response(df, column_list, user_email):
-    date_pulled = date.today().strftime("%Y-%m-%d")
-    for col in column_list:
-        if col not in df.columns:
-            df[col] = None
-        df = df.reindex(columns=column_list)
-    df.insert(0, "id", user_email)
-    df.insert(1, "date", date_pulled)
-    df.insert(14, "surgery_date", date_pulled)
-    df = clean_columns(df)
+def _create_subscription(encoded_id):
+    """subscribe the current user to notifications for all collections
+
+    the subscription is named after the user's encoded id, so
+    registering again is a no-op (fitbit answers 200 for an existing
+    subscription).  notifications are received by `/fitbit_subscription`
+    of ``app.fitbit_ingest``.
+    """
+
+    if not subscriber_id:
+        return
+
+    resp = fitbit.post(
+        f"/1/user/-/apiSubscriptions/{encoded_id}.json",
+        headers={"X-Fitbit-Subscriber-Id": subscriber_id},
+    )
+
+    log.debug(
+        "subscription for %s: %d [%s]",
+        encoded_id,
+        resp.status_code,
+        resp.reason,
+    )
 
-    return df
+    if resp.status_code not in (requests.codes.ok, requests.codes.created):
+        log.error("subscription failed for %s: %s", encoded_id, resp.text)
 
 
 def _export_profile_to_bigquery(id, profile):
 
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-
-    profile_df = pd.json_normalize(profile)
-    profile_columns = [
-        "age",
-        "city",
-        "state",
-        "country",
-        "dateOfBirth",
-        "displayName",
-        "encodedId",
-        "fullName",
-        "gender",
-        "height",
-        "heightUnit",
-        "timezone",
-    ]
-    profile_df = _normalize_response(profile_df, profile_columns, id)
-
-    pandas_gbq.to_gbq(
-        dataframe=profile_df,
-        destination_table=_tablename("profile"),
-        project_id=project_id,
-        if_exists="append",
-        table_schema=[
-            {"name": "id", "type": "STRING", "description": "Primary Key"},
-            {
-                "name": "date",
-                "type": "DATE",
-                "description": "Date of authorization",
-            },
-            {
-                "name": "user_age",
-                "type": "INTEGER",
-                "description": "The age based on their specified birthday in the user's account settings.",
-            },
-            {
-                "name": "user_city",
-                "type": "STRING",
-                "description": "The city specified in the user's account settings. Location scope is required to see this value.",
-            },
-            {
-                "name": "user_state",
-                "type": "STRING",
-                "description": "The state specified in the user's account settings. Location scope is required to see this value. ",
-            },
-            {
-                "name": "user_country",
-                "type": "STRING",
-                "description": "The country specified in the user's account settings. Location scope is required to see this value.",
-            },
-            {
-                "name": "user_date_of_birth",
-                "type": "DATE",
-                "description": "The birthday date specified in the user's account settings.",
-            },
-            {
-                "name": "user_display_name",
-                "type": "STRING",
-                "description": "The name shown when the user's friends look at their Fitbit profile, send a message, or other interactions within the Friends section of the Fitbit app or fitbit.com dashboard, such as challenges.",
-            },
-            {
-                "name": "user_encoded_id",
-                "type": "STRING",
-                "description": "The encoded ID of the user. Use '-' (dash) for current logged-in user.",
-            },
-            {
-                "name": "user_full_name",
-                "type": "STRING",
-                "description": "The full name value specified in the user's account settings.",
-            },
-            {
-                "name": "user_gender",
-                "type": "STRING",
-                "description": "The user's specified gender.",
-            },
-            {
-                "name": "user_height",
-                "type": "FLOAT",
-                "description": "The height value specified in the user's account settings.",
-            },
-            {
-                "name": "user_height_unit",
-                "type": "STRING",
-                "description": "The unit system defined in the user's account settings. See Localization.",
-            },
-            {
-                "name": "user_timezone",
-                "type": "STRING",
-                "description": "The timezone defined in the user's account settings.",
-            },
-            {"name": "surgery_date", "type": "DATE"},
-        ],
+    make_sink().write(
+        "profile", profile_dataframe(id, profile), PROFILE_TABLE_SCHEMA
     )
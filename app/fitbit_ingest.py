@@ -23,7 +23,7 @@ Routes:
 
     /ingest: test route to test if the blueprint is correctly registered
 
-    /fitbit_chunk_1: Badges, Social, Device information
+    /fitbit_chunk_1: Badges, Social, Device and Profile information
 
     /fitbit_body_weight: body and weight data
 
@@ -39,6 +39,29 @@ Routes:
 
     /fitbit_spo2_scope: spo2 data
 
+    /fitbit_spo2_intraday_scope: intraday spo2 data
+
+    /fitbit_temp_scope: skin temperature data
+
+    /fitbit_subscription: fitbit subscriber endpoint for notifications
+
+    /fitbit_bootstrap_tables: creates the partitioned and clustered
+        tables of all scopes
+
+    /fitbit_retry_dead_letters: re-runs the failed (user, scope, date)
+        units, see ``app.dead_letters``
+
+    every route runs the same engine, `_ingest_scope`, over the scope's
+    entry in ``app.fitbit_registry``, which describes the endpoints to
+    call and the tables each response feeds.
+
+    the scope routes accept the optional query params `date` (defaults
+    to each user's local days not pulled yet, up to the latest complete
+    one), `user` (a single user instead of all users), `force` (ignore
+    the ingest state caches, see ``app.ingest_state``) and `replay`
+    (rebuild the tables from the archived responses, see
+    ``app.response_archive``; needs `INGEST_LOAD_MODE=upsert`).
+
 Dependencies:
 
     - fitbit application configuration is required to access the
@@ -53,27 +76,63 @@ Configuration:
     * `GOOGLE_CLOUD_PROJECT`: gcp project where bigquery is available.
     * `GOOGLE_APPLICATION_CREDENTIALS`: points to a service account json.
     * `BIGQUERY_DATASET`: dataset to use to store user data.
+    * `FITBIT_SUBSCRIBER_VERIFY_CODE`: optional, verification code of the
+        fitbit subscriber pointing at `/fitbit_subscription`.  users are
+        subscribed at registration, see `FITBIT_SUBSCRIBER_ID` in
+        ``app.fitbit_auth``.
+    * `FITBIT_OAUTH_CLIENT_SECRET`: used to check the signature of
+        subscription notifications.
+    * `FITBIT_SYNC_MAX_AGE`: optional, seconds the device sync time cached
+        by `/fitbit_chunk_1` is trusted before other scopes check again.
+        defaults to 3600.
+    * `FITBIT_DAY_GRACE_HOURS`: optional, hours after a user's local
+        midnight before the previous day is pulled.  defaults to 3.
+    * `FITBIT_MAX_CATCHUP_DAYS`: optional, most days not pulled yet that
+        a scope catches up on for a user in one run.  defaults to 7.
+    * `FITBIT_REFRESH_TTLS`: optional, days between refreshes of the
+        slow-changing endpoints, e.g. `badges=14,social=7`.  see
+        `refresh_ttl_days` for the endpoints and their defaults.
+    * `INGEST_QUEUE_SIZE`: optional, users fetched ahead of the stage
+        transforming the responses.  defaults to 8.
 
 Notes:
 
-    all the data is ingested into BigQuery tables.
+    all the data is ingested into BigQuery tables, or the local store
+    chosen by `INGEST_SINK` (see ``app.table_sink``).  rows are buffered
+    per table and loaded whenever a buffer fills up, see
+    ``app.table_sink`` for the thresholds.  fetching, transforming and
+    loading overlap, see `_ingest_scope`.
 
 
 """
 
 import os
+import hmac
+import base64
+import hashlib
+import queue
 import timeit
+import threading
+from concurrent.futures import Future
 from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 import logging
 
-import pandas as pd
-import pandas_gbq
 from flask import Blueprint, request
 from flask_dance.contrib.fitbit import fitbit
 from authlib.integrations.flask_client import OAuth
-from skimpy import clean_columns
 
 from .fitbit_auth import fitbit_bp
+from .fitbit_registry import SCOPES, last_sync_time
+from .table_sink import BufferedTable, Uploader, make_sink, load_mode
+from .transform_pool import (
+    append_result,
+    transform_pool,
+    transform_tables,
+)
+from .response_archive import ResponseArchive, archive_path
+from .ingest_state import ingest_state, content_hash
+from .dead_letters import dead_letters
 
 
 log = logging.getLogger(__name__)
@@ -81,13 +140,32 @@ log = logging.getLogger(__name__)
 
 bp = Blueprint("fitbit_ingest_bp", __name__)
 
-bigquery_datasetname = os.environ.get("BIGQUERY_DATASET")
-if not bigquery_datasetname:
-    bigquery_datasetname = "fitbit2"
+# seconds a cached device sync time is trusted before checking again
+sync_max_age = int(os.environ.get("FITBIT_SYNC_MAX_AGE", 3600))
+
+# users fetched ahead of the transform stage
+queue_size = int(os.environ.get("INGEST_QUEUE_SIZE", 8))
 
+# hours after local midnight before a user's day is considered complete
+day_grace_hours = int(os.environ.get("FITBIT_DAY_GRACE_HOURS", 3))
 
-def _tablename(table: str) -> str:
-    return bigquery_datasetname + "." + table
+# most days a scope catches up on for a user in one run
+max_catchup_days = int(os.environ.get("FITBIT_MAX_CATCHUP_DAYS", 7))
+
+# days between refreshes of slow-changing endpoints
+refresh_ttl_days = {
+    "badges": 7,
+    "social": 7,
+    "profile": 7,
+    "activity_goals": 7,
+    "nutrition_goals": 7,
+    # also refreshes the device sync times, keep it daily
+    "device": 1,
+}
+for item in os.environ.get("FITBIT_REFRESH_TTLS", "").split(","):
+    if "=" in item:
+        endpoint, days = item.split("=")
+        refresh_ttl_days[endpoint.strip()] = int(days)
 
 
 @bp.route("/ingest")
@@ -135,1176 +213,792 @@ def ingest():
     return str(result)
 
 
-def _normalize_response(df, column_list, email, date_pulled):
-    for col in column_list:
-        if col not in df.columns:
-            df[col] = None
-    df = df.reindex(columns=column_list)
-    df.insert(0, "id", email)
-    df.insert(1, "date", date_pulled)
-    df = clean_columns(df)
-    return df
-
+def _date_pulled(timezone=None):
+    """set the date pulled
 
-def _date_pulled():
-    """set the date pulled"""
+    without a timezone, this is yesterday on the server clock.  with a
+    timezone, it is the latest day in that timezone that ended at least
+    `FITBIT_DAY_GRACE_HOURS` ago, so the user's device had a chance to
+    sync the whole day.
+    """
 
     date_pulled = date.today() - timedelta(days=1)
+
+    if timezone:
+        try:
+            local_now = datetime.now(ZoneInfo(timezone))
+            date_pulled = (local_now - timedelta(hours=day_grace_hours)).date()
+            date_pulled = date_pulled - timedelta(days=1)
+        except (Exception) as e:
+            log.error("exception occured: %s", str(e))
+
     return date_pulled.strftime("%Y-%m-%d")
 
 
-#
-# Chunk 1: Badges, Social, Device
-#
-@bp.route("/fitbit_chunk_1")
-def fitbit_chunk_1():
+def _dates_to_pull(user, scope, latest):
+    """the complete local days of user not pulled yet for scope
 
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
+    every day after the last day scope was pulled for user, up to the
+    latest complete day (see `_date_pulled`) and at most
+    `FITBIT_MAX_CATCHUP_DAYS` of them.  the wall clock only decides the
+    latest day, so a run never skips a day or pulls one twice when the
+    user's utc offset moves across the grace period.  scopes never
+    pulled, and scope None, start with the latest day.
+    """
 
-    log.debug("fitbit_chunk_1:")
+    pulled = None
+    if scope:
+        pulled = ingest_state.get(user).get("pulled", {}).get(scope, {})
+        pulled = pulled.get("date")
 
-    pd.set_option("display.max_columns", 500)
+    if not pulled:
+        return [latest]
 
-    badges_list = []
-    device_list = []
-    social_list = []
+    last = datetime.strptime(latest, "%Y-%m-%d").date()
+    first = max(
+        datetime.strptime(pulled, "%Y-%m-%d").date() + timedelta(days=1),
+        last - timedelta(days=max_catchup_days - 1),
+    )
 
-    for user in user_list:
+    return [
+        (first + timedelta(days=day)).strftime("%Y-%m-%d")
+        for day in range((last - first).days + 1)
+    ]
 
-        log.debug("user: %s", user)
 
-        fitbit_bp.storage.user = user
+def _user_dates(scope=None):
+    """users to ingest, each paired with a date to pull
 
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
+    honors the `user` and `date` query params.  otherwise users are
+    grouped by the timezone of their cached fitbit profile, and each is
+    paired with every day of its group not pulled yet for scope, see
+    `_dates_to_pull`.
 
-        try:
+    if scope is given, users are ordered by priority for that scope
+    (stalest first, see ``IngestState.priority``), so a run that is cut
+    short has loaded the data most at risk.
+    """
+
+    user_list = fitbit_bp.storage.all_users()
+    if request.args.get("user") in user_list:
+        user_list = [request.args.get("user")]
 
-            ############## CONNECT TO BADGES ENDPOINT #################
+    ingest_state.load_all(user_list)
 
-            resp = fitbit.get("/1/user/-/badges.json")
+    # if caller provided date as query params, use that for everybody
+    if request.args.get("date"):
+        user_dates = [(user, request.args.get("date")) for user in user_list]
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+    else:
+        timezones = {}
+        for user in user_list:
+            timezone = ingest_state.get(user).get("timezone")
+            timezones.setdefault(timezone, []).append(user)
 
-            badges = resp.json()["badges"]
-
-            badges_df = pd.json_normalize(badges)
-            badges_columns = [
-                "badgeGradientEndColor",
-                "badgeGradientStartColor",
-                "badgeType",
-                "category",
-                "cheers",
-                "dateTime",
-                "description",
-                "earnedMessage",
-                "encodedId",
-                "image100px",
-                "image125px",
-                "image300px",
-                "image50px",
-                "image75px",
-                "marketingDescription",
-                "mobileDescription",
-                "name",
-                "shareImage640px",
-                "shareText",
-                "shortDescription",
-                "shortName",
-                "timesAchieved",
-                "value",
-                "unit",
-            ]
-            badges_df = _normalize_response(
-                badges_df, badges_columns, user, date_pulled
+        user_dates = []
+        for timezone, users in timezones.items():
+            date_pulled = _date_pulled(timezone)
+            log.debug(
+                "%s: pulling up to %s for %d users",
+                timezone,
+                date_pulled,
+                len(users),
             )
-            try:
-                badges_df = badges_df.drop(["cheers"], axis=1)
-            except:
-                pass
+            for user in users:
+                user_dates.extend(
+                    (user, day)
+                    for day in _dates_to_pull(user, scope, date_pulled)
+                )
 
-            badges_list.append(badges_df)
+    if scope:
+        user_dates.sort(
+            key=lambda ud: ingest_state.priority(ud[0], scope, ud[1]),
+            reverse=True,
+        )
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    return user_dates
 
-        try:
-            ############## CONNECT TO DEVICE ENDPOINT #################
-            resp = fitbit.get("1/user/-/devices.json")
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+def _known_empty(user, scope, date_pulled, force):
+    """True if scope returned no data lately and is not due a re-probe"""
 
-            device_df = pd.json_normalize(resp.json())
-            try:
-                device_df = device_df.drop(
-                    ["features", "id", "mac", "type"], axis=1
-                )
-            except:
-                pass
-
-            device_columns = [
-                "battery",
-                "batteryLevel",
-                "deviceVersion",
-                "lastSyncTime",
-            ]
-            device_df = _normalize_response(
-                device_df, device_columns, user, date_pulled
-            )
-            device_df["last_sync_time"] = device_df["last_sync_time"].apply(
-                lambda x: datetime.strptime(x, "%Y-%m-%dT%H:%M:%S.%f")
-            )
-            device_list.append(device_df)
+    if force or ingest_state.should_probe(user, scope, date_pulled):
+        return False
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    log.debug("%s: skipping %s, no data expected", user, scope)
+    return True
 
-        try:
-            ############## CONNECT TO SOCIAL ENDPOINT #################
-            resp = fitbit.get("1.1/user/-/friends.json")
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+def _refresh_due(user, endpoint, date_pulled, force):
+    """True if a slow-changing endpoint is due to be fetched again"""
 
-            social_df = pd.json_normalize(resp.json()["data"])
-            social_df = social_df.rename(columns={"id": "friend_id"})
-            social_columns = [
-                "friend_id",
-                "type",
-                "attributes.name",
-                "attributes.friend",
-                "attributes.avatar",
-                "attributes.child",
-            ]
-            social_df = _normalize_response(
-                social_df, social_columns, user, date_pulled
-            )
-            social_list.append(social_df)
+    if force or ingest_state.refresh_due(
+        user, endpoint, date_pulled, refresh_ttl_days[endpoint]
+    ):
+        return True
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    log.debug("%s: skipping %s, refreshed recently", user, endpoint)
+    return False
 
-    # end loop over users
 
-    #### CONCAT DATAFRAMES INTO BULK DF ####
+def _payload_changed(user, table, records, reload, refreshes):
+    """True if the records of a refreshed table need to be loaded
+
+    the refresh is only recorded once the rows are loaded, refreshes
+    collects the endpoint name, records hash and the table to load (None
+    if unchanged) for `_record_loaded`.
+    """
 
-    load_stop = timeit.default_timer()
-    time_to_load = load_stop - start
-    print("Program Executed in " + str(time_to_load))
+    payload_hash = content_hash(records)
+    changed = reload or ingest_state.refresh_changed(
+        user, table.refresh, payload_hash
+    )
+    refreshes[table.refresh] = (payload_hash, table.table if changed else None)
+    return changed
 
-    # ######## LOAD DATA INTO BIGQUERY #########
 
-    log.debug("push to BQ")
+def _device_idle(user, scope, date_pulled, force):
+    """True if the user's device has not synced anything new for scope
 
-    # sql = """
-    # SELECT country_name, alpha_2_code
-    # FROM `bigquery-public-data.utility_us.country_code_iso`
-    # WHERE alpha_2_code LIKE 'A%'
-    # """
-    # df = pandas_gbq.read_gbq(sql, project_id=project_id)
+    uses the sync time cached by `/fitbit_chunk_1`, and re-checks the
+    devices endpoint once it is older than `FITBIT_SYNC_MAX_AGE`.  the
+    fitbit session must already be set up for user.
+    """
 
-    if len(badges_list) > 0:
+    if force:
+        return False
 
+    if not ingest_state.sync_checked_within(user, sync_max_age):
         try:
 
-            bulk_badges_df = pd.concat(badges_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_badges_df,
-                destination_table=_tablename("badges"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {"name": "badge_gradient_end_color", "type": "STRING"},
-                    {"name": "badge_gradient_start_color", "type": "STRING"},
-                    {
-                        "name": "badge_type",
-                        "type": "STRING",
-                        "description": "Type of badge received.",
-                    },
-                    {"name": "category", "type": "STRING"},
-                    {
-                        "name": "date_time",
-                        "type": "STRING",
-                        "description": "Date the badge was achieved.",
-                    },
-                    {"name": "description", "type": "STRING"},
-                    {"name": "image_100px", "type": "STRING"},
-                    {"name": "image_125px", "type": "STRING"},
-                    {"name": "image_300px", "type": "STRING"},
-                    {"name": "image_50px", "type": "STRING"},
-                    {"name": "image_75px", "type": "STRING"},
-                    {"name": "name", "type": "STRING"},
-                    {"name": "share_image_640px", "type": "STRING"},
-                    {"name": "share_text", "type": "STRING"},
-                    {"name": "short_name", "type": "STRING"},
-                    {
-                        "name": "times_achieved",
-                        "type": "INTEGER",
-                        "description": "Number of times the user has achieved the badge.",
-                    },
-                    {
-                        "name": "value",
-                        "type": "INTEGER",
-                        "description": "Units of meaure based on localization settings.",
-                    },
-                    {
-                        "name": "unit",
-                        "type": "STRING",
-                        "description": "The badge goal in the unit measurement.",
-                    },
-                ],
-            )
+            resp = fitbit.get("1/user/-/devices.json")
+
+            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+            resp.raise_for_status()
+
+            ingest_state.record_sync(user, last_sync_time(resp.json()))
 
         except (Exception) as e:
             log.error("exception occured: %s", str(e))
+            return False
 
-    if len(device_list) > 0:
+    if ingest_state.device_idle(user, scope, date_pulled):
+        log.debug("%s: skipping %s, device has not synced", user, scope)
+        return True
 
-        try:
+    return False
 
-            bulk_device_df = pd.concat(device_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_device_df,
-                destination_table=_tablename("device"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "battery",
-                        "type": "STRING",
-                        "description": "Returns the battery level of the device. Supported: High | Medium | Low | Empty",
-                    },
-                    {
-                        "name": "battery_level",
-                        "type": "INTEGER",
-                        "description": "Returns the battery level percentage of the device.",
-                    },
-                    {
-                        "name": "device_version",
-                        "type": "STRING",
-                        "description": "The product name of the device.",
-                    },
-                    {
-                        "name": "last_sync_time",
-                        "type": "TIMESTAMP",
-                        "description": "Timestamp representing the last time the device was sync'd with the Fitbit mobile application.",
-                    },
-                ],
-            )
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+def _valid_signature(body, signature):
+    """check the X-Fitbit-Signature header of a notification"""
+
+    if not signature:
+        return False
+
+    key = os.environ.get("FITBIT_OAUTH_CLIENT_SECRET", "") + "&"
+    digest = hmac.new(key.encode(), body, hashlib.sha1).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
 
-    if len(social_list) > 0:
+#
+# Subscriptions
+#
+@bp.route("/fitbit_subscription", methods=["GET", "POST"])
+def fitbit_subscription():
+    """fitbit subscriber endpoint
+
+    fitbit verifies the subscriber with a GET carrying the `verify`
+    query param, and delivers notifications with a POST for the users
+    subscribed at registration.  each
+    notification marks the scopes matching its collection type as
+    pending and clears their negative-result cache, so the next run
+    probes them again, ahead of other users.
+    """
+
+    if request.method == "GET":
+        verify_code = os.environ.get("FITBIT_SUBSCRIBER_VERIFY_CODE")
+        if verify_code and request.args.get("verify") == verify_code:
+            return "", 204
+        return "", 404
+
+    if not _valid_signature(
+        request.get_data(), request.headers.get("X-Fitbit-Signature")
+    ):
+        log.error("subscription notification with invalid signature")
+        return "", 404
+
+    for notification in request.get_json(silent=True) or []:
 
         try:
 
-            bulk_social_df = pd.concat(social_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_social_df,
-                destination_table=_tablename("social"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "friend_id",
-                        "type": "STRING",
-                        "description": "Fitbit user id",
-                    },
-                    {
-                        "name": "type",
-                        "type": "STRING",
-                        "description": "Fitbit user id",
-                    },
-                    {
-                        "name": "attributes_name",
-                        "type": "STRING",
-                        "description": "Person's display name.",
-                    },
-                    {
-                        "name": "attributes_friend",
-                        "type": "BOOLEAN",
-                        "description": "The product name of the device.",
-                    },
-                    {
-                        "name": "attributes_avatar",
-                        "type": "STRING",
-                        "description": "Link to user's avatar picture.",
-                    },
-                    {
-                        "name": "attributes_child",
-                        "type": "BOOLEAN",
-                        "description": "Boolean value describing friend as a child account.",
-                    },
-                ],
+            user = ingest_state.find_user(notification["ownerId"])
+            if not user:
+                log.debug("no user for notification: %s", notification)
+                continue
+
+            ingest_state.load(user)
+            ingest_state.record_notification(
+                user, notification["collectionType"], notification["date"]
             )
 
         except (Exception) as e:
             log.error("exception occured: %s", str(e))
 
-    stop = timeit.default_timer()
-    execution_time = stop - start
-    print("Fitbit Chunk Loaded " + str(execution_time))
-
-    fitbit_bp.storage.user = None
-
-    return "Fitbit Chunk Loaded"
+    return "", 204
 
 
 #
-# Body and Weight
+# Ingestion engine
 #
-@bp.route("/fitbit_body_weight")
-def fitbit_body_weight():
+class _Unit:
+    """the responses of a scope for one user and date
+
+    jobs are (table names, job) pairs, job is either a future of
+    ``transform_tables`` or a (tables, payload) pair transformed by
+    `_collect`.  hashes maps the key of each endpoint loaded to its
+    content hash and table names, refreshes each slow-changing endpoint
+    to its hash and the table loaded (None if unchanged).  tables are
+    the tables the unit has rows in, error the last failure of the unit
+    and empty is set when an endpoint's empty rule matched.
+    """
+
+    def __init__(self, user, date_pulled):
+
+        self.user = user
+        self.date_pulled = date_pulled
+        self.complete = True
+        self.empty = False
+        self.error = None
+        self.jobs = []
+        self.hashes = {}
+        self.refreshes = {}
+        self.tables = set()
+
+
+def _collect(tables, unit):
+    """append the rows of a unit's responses to the tables
+
+    a failed transform makes the unit incomplete.  the hashes and
+    refreshes of the responses that failed to transform are dropped,
+    the others are recorded once their rows are loaded, whether the
+    unit is complete or not.
+    """
+
+    failed = set()
+
+    for names, job in unit.jobs:
+        try:
+            if isinstance(job, Future):
+                for name, data in job.result().items():
+                    append_result(tables[name], data)
+            else:
+                selected, payload = job
+                for table in selected:
+                    table.append(
+                        tables[table.table],
+                        payload,
+                        unit.user,
+                        unit.date_pulled,
+                    )
+            unit.tables.update(names)
+        except (Exception) as e:
+            log.error("exception occured: %s", str(e))
+            unit.complete = False
+            unit.error = e
+            failed.update(names)
 
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
+    # the responses are not needed anymore
+    unit.jobs = []
 
-    pd.set_option("display.max_columns", 500)
+    unit.hashes = {
+        key: (payload_hash, names)
+        for key, (payload_hash, names) in unit.hashes.items()
+        if failed.isdisjoint(names)
+    }
+    unit.refreshes = {
+        endpoint: (payload_hash, table)
+        for endpoint, (payload_hash, table) in unit.refreshes.items()
+        if table not in failed
+    }
 
-    body_weight_df_list = []
 
-    for user in user_list:
+def _transform_stage(tables, work, replay, loaded):
+    """consume the units queued by the fetch stage until None
 
-        log.debug("user: %s", user)
+    appends the units to loaded, except for replays which leave the
+    ingest state and dead letters alone.
+    """
 
-        fitbit_bp.storage.user = user
+    while True:
 
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
+        unit = work.get()
+        if unit is None:
+            return
 
         try:
-
-            resp = fitbit.get(
-                "/1/user/-/body/log/weight/date/" + date_pulled + ".json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            body_weight = resp.json()["weight"]
-            assert body_weight, "weight returned no data"
-            body_weight_df = pd.json_normalize(body_weight)
-            try:
-                body_weight_df = body_weight_df.drop(["date", "time"], axis=1)
-            except:
-                pass
-
-            body_weight_columns = ["bmi", "fat", "logId", "source", "weight"]
-            body_weight_df = _normalize_response(
-                body_weight_df, body_weight_columns, user, date_pulled
-            )
-            body_weight_df_list.append(body_weight_df)
-
+            _collect(tables, unit)
+            if not replay:
+                loaded.append(unit)
         except (Exception) as e:
             log.error("exception occured: %s", str(e))
 
-    # end loop over users
 
-    log.debug("push to BQ")
+def _record_loaded(spec, tables, uploader, loaded):
+    """record the outcome of the units once their rows are loaded
 
-    if len(body_weight_df_list) > 0:
+    called once the uploader is joined.  a unit with rows in a table
+    that failed to load (whichever rows the failed load held) counts as
+    failed.  failed units are recorded as dead letters, the others
+    clear theirs and, if complete, are recorded as pulled.  a hash or
+    refresh is only recorded if none of its tables failed to load.
+    """
 
+    failed = set(uploader.errors)
+    failed.update(name for name, table in tables.items() if table.errors)
+    if failed:
+        log.error("%s: loads failed for %s", spec.name, sorted(failed))
+
+    for unit in loaded:
         try:
 
-            bulk_body_weight_df = pd.concat(body_weight_df_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_body_weight_df,
-                destination_table=_tablename("body_weight"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "bmi",
-                        "type": "FLOAT",
-                        "description": "Calculated BMI in the format X.XX",
-                    },
-                    {
-                        "name": "fat",
-                        "type": "FLOAT",
-                        "description": "The body fat percentage.",
-                    },
-                    {
-                        "name": "log_id",
-                        "type": "INTEGER",
-                        "description": "Weight Log IDs are unique to the user, but not globally unique.",
-                    },
-                    {
-                        "name": "source",
-                        "type": "STRING",
-                        "description": "The source of the weight log.",
-                    },
-                    {
-                        "name": "weight",
-                        "type": "FLOAT",
-                        "description": "Weight in the format X.XX,",
-                    },
-                ],
-            )
+            failed_loads = failed & unit.tables
+            if failed_loads and not unit.error:
+                unit.error = RuntimeError(
+                    f"load failed for {', '.join(sorted(failed_loads))}"
+                )
+
+            if unit.error:
+                dead_letters.record(
+                    unit.user, spec.name, unit.date_pulled, unit.error
+                )
+            elif unit.complete or unit.empty:
+                dead_letters.clear(unit.user, spec.name, unit.date_pulled)
+                if unit.complete and spec.tracked:
+                    ingest_state.record_pull(
+                        unit.user, spec.name, unit.date_pulled
+                    )
+
+            hashes = {
+                key: payload_hash
+                for key, (payload_hash, names) in unit.hashes.items()
+                if failed.isdisjoint(names)
+            }
+            if hashes:
+                ingest_state.record_content(unit.user, unit.date_pulled, hashes)
+            for endpoint, (payload_hash, table) in unit.refreshes.items():
+                if table not in failed:
+                    ingest_state.record_refresh(
+                        unit.user, endpoint, unit.date_pulled, payload_hash
+                    )
 
         except (Exception) as e:
             log.error("exception occured: %s", str(e))
 
-    stop = timeit.default_timer()
-    execution_time = stop - start
-    print("Body & Weight Scope Loaded " + str(execution_time))
 
-    fitbit_bp.storage.user = None
+def _fetch(endpoint, user, date_pulled, archive, replay):
+    """response of endpoint for a user-day, None if replay finds none
 
-    return "Body & Weight Scope Loaded"
+    the fitbit session must already be set up for user.  raises
+    ``requests.HTTPError`` for error responses.  responses are archived
+    when archive is given, replay reads them back from it instead of
+    calling the api.
+    """
 
+    if replay:
+        return archive.payload(endpoint.key, user, date_pulled)
 
-#
-# Nutrition Data
-#
-@bp.route("/fitbit_nutrition_scope")
-def fitbit_nutrition_scope():
+    resp = fitbit.get(endpoint.url(date_pulled))
 
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
+    log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
 
-    pd.set_option("display.max_columns", 500)
+    # error bodies (rate limits, expired tokens, outages) are failures,
+    # not responses: they must not reach the empty rules or the archive
+    resp.raise_for_status()
 
-    nutrition_summary_list = []
-    nutrition_logs_list = []
-    nutrition_goals_list = []
+    payload = resp.json()
 
-    for user in user_list:
+    if archive:
+        archive.record(endpoint.key, user, date_pulled, payload)
 
-        log.debug("user: %s", user)
+    return payload
 
-        fitbit_bp.storage.user = user
 
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
+def _select_tables(
+    spec, endpoint, user, date_pulled, payload, force, reload, refreshes
+):
+    """tables of endpoint to load from a response, None if it is empty
 
-        try:
+    runs the response hooks and updates the negative cache of endpoints
+    with an empty rule.  tables of slow-changing endpoints are only
+    loaded when due and changed, their refreshes are added to refreshes
+    (see `_payload_changed`).
+    """
+
+    if endpoint.on_response:
+        endpoint.on_response(user, payload)
+
+    if endpoint.empty:
+        if endpoint.empty(payload):
+            # also records the pull
+            ingest_state.record_empty(user, spec.name, date_pulled)
+            return None
+        ingest_state.record_data(user, spec.name)
 
-            resp = fitbit.get(
-                "/1/user/-/foods/log/date/" + date_pulled + ".json"
+    return [
+        table
+        for table in endpoint.tables
+        if not table.refresh
+        or (
+            _refresh_due(user, table.refresh, date_pulled, force)
+            and _payload_changed(
+                user, table, table.records(payload), reload, refreshes
             )
+        )
+    ]
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
 
-            nutrition_summary = resp.json()["summary"]
-            nutrition_logs = resp.json()["foods"]
+def _ingest_scope(spec, user_dates, force, replay=False, reload=None):
+    """pull the endpoints of a scope for each user and load its tables
 
-            nutrition_summary_df = pd.json_normalize(nutrition_summary)
-            nutrition_logs_df = pd.json_normalize(nutrition_logs)
+    spec is a ``ScopeSpec`` from ``app.fitbit_registry``.  every table
+    of the scope is buffered and flushed as it fills up (see
+    ``BufferedTable``), the remaining rows are loaded once all users are
+    done.  a user counts as pulled for the scope only if all of its
+    endpoints were retrieved, transformed and loaded, see
+    `_record_loaded`.
 
-            try:
-                nutrition_logs_df = nutrition_logs_df.drop(
-                    [
-                        "loggedFood.creatorEncodedId",
-                        "loggedFood.unit.id",
-                        "loggedFood.units",
-                    ],
-                    axis=1,
-                )
-            except:
-                pass
-
-            nutrition_summary_columns = [
-                "calories",
-                "carbs",
-                "fat",
-                "fiber",
-                "protein",
-                "sodium",
-                "water",
-            ]
-            nutrition_logs_columns = [
-                "isFavorite",
-                "logDate",
-                "logId",
-                "loggedFood.accessLevel",
-                "loggedFood.amount",
-                "loggedFood.brand",
-                "loggedFood.calories",
-                "loggedFood.foodId",
-                "loggedFood.mealTypeId",
-                "loggedFood.name",
-                "loggedFood.unit.name",
-                "loggedFood.unit.plural",
-                "nutritionalValues.calories",
-                "nutritionalValues.carbs",
-                "nutritionalValues.fat",
-                "nutritionalValues.fiber",
-                "nutritionalValues.protein",
-                "nutritionalValues.sodium",
-                "loggedFood.locale",
-            ]
-
-            nutrition_summary_df = _normalize_response(
-                nutrition_summary_df,
-                nutrition_summary_columns,
-                user,
-                date_pulled,
-            )
-            nutrition_logs_df = _normalize_response(
-                nutrition_logs_df, nutrition_logs_columns, user, date_pulled
-            )
+    the route runs as three stages joined by bounded queues: this thread
+    fetches the responses, a thread transforms them into the buffers
+    (or collects the rows of ``transform_pool`` workers) and full
+    buffers are loaded by an ``Uploader``.  at most `INGEST_QUEUE_SIZE`
+    users wait between fetching and transforming.
 
-            nutrition_summary_list.append(nutrition_summary_df)
-            nutrition_logs_list.append(nutrition_logs_df)
+    responses identical to the one loaded for the same user, endpoint
+    and date (see ``IngestState.content_unchanged``) are neither
+    transformed nor loaded again, so re-pulling recent dates only costs
+    the api calls.  the hash of a response, and the refresh of a
+    slow-changing endpoint, are recorded once its tables are loaded,
+    and not at all if one of them failed to load.
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    with `INGEST_ARCHIVE_PATH` set every response is archived, and with
+    replay the responses are read back from the archive instead of the
+    api: the tables are rebuilt without api calls, ignoring and leaving
+    alone the ingest state.  replay merges the rows on the natural key
+    of the tables and is refused unless `INGEST_LOAD_MODE` is `upsert`.
 
-        try:
-            resp = fitbit.get("/1/user/-/foods/log/goal.json")
+    force ignores the ingest state caches (negative cache, device sync,
+    refresh ttls), reload (by default the same as force) also loads the
+    responses that did not change.  replay loads every response.
+    """
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+    if reload is None:
+        reload = force
 
-            nutrition_goal = resp.json()["goals"]
-            nutrition_goal_df = pd.json_normalize(nutrition_goal)
-            nutrition_goal_columns = ["calories"]
-            nutrition_goal_df = _normalize_response(
-                nutrition_goal_df, nutrition_goal_columns, user, date_pulled
-            )
-            nutrition_goals_list.append(nutrition_goal_df)
+    if replay and not archive_path:
+        log.error("%s: replay needs INGEST_ARCHIVE_PATH", spec.name)
+        return
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    # appending the archived rows again would duplicate the tables
+    if replay and load_mode != "upsert":
+        log.error("%s: replay needs INGEST_LOAD_MODE=upsert", spec.name)
+        return
 
-    # end of loop over users
-    log.debug("push to BQ")
+    start = timeit.default_timer()
 
-    if len(nutrition_summary_list) > 0:
+    archive = ResponseArchive() if archive_path else None
+
+    if not replay:
+        dead_letters.load(spec.name)
+
+    uploader = Uploader(make_sink())
+    tables = {
+        table.table: BufferedTable(
+            table.table,
+            table.schema,
+            sink=uploader,
+            pivot=table.pivot,
+            key=table.key,
+        )
+        for table in spec.tables
+    }
+
+    pool = transform_pool()
+    # units fetched and not transformed yet
+    work = queue.Queue(maxsize=queue_size)
+    # units transformed, recorded once loaded
+    loaded = []
+    transformer = threading.Thread(
+        target=_transform_stage,
+        args=(tables, work, replay, loaded),
+        daemon=True,
+    )
+    transformer.start()
+
+    for user, date_pulled in user_dates:
 
-        try:
+        log.debug("user: %s", user)
 
-            bulk_nutrition_summary_df = pd.concat(
-                nutrition_summary_list, axis=0
-            )
+        if (
+            not replay
+            and spec.negative_cache
+            and _known_empty(user, spec.name, date_pulled, force)
+        ):
+            continue
 
-            pandas_gbq.to_gbq(
-                dataframe=bulk_nutrition_summary_df,
-                destination_table=_tablename("nutrition_summary"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "calories",
-                        "type": "FLOAT",
-                        "description": "Total calories consumed.",
-                    },
-                    {
-                        "name": "carbs",
-                        "type": "FLOAT",
-                        "description": "Total carbs consumed.",
-                    },
-                    {
-                        "name": "fat",
-                        "type": "FLOAT",
-                        "description": "Total fats consumed.",
-                    },
-                    {
-                        "name": "fiber",
-                        "type": "FLOAT",
-                        "description": "Total fibers cosnsumed.",
-                    },
-                    {
-                        "name": "protein",
-                        "type": "FLOAT",
-                        "description": "Total proteins consumed.",
-                    },
-                    {
-                        "name": "sodium",
-                        "type": "FLOAT",
-                        "description": "Total sodium consumed.",
-                    },
-                    {
-                        "name": "water",
-                        "type": "FLOAT",
-                        "description": "Total water consumed",
-                    },
-                ],
-            )
+        fitbit_bp.storage.user = user
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+        if fitbit_bp.session.token:
+            del fitbit_bp.session.token
 
-    if len(nutrition_logs_list) > 0:
+        if (
+            not replay
+            and spec.device_gated
+            and _device_idle(user, spec.name, date_pulled, force)
+        ):
+            continue
 
-        try:
+        unit = _Unit(user, date_pulled)
 
-            bulk_nutrition_logs_df = pd.concat(nutrition_logs_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_nutrition_logs_df,
-                destination_table=_tablename("nutrition_logs"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "is_favorite",
-                        "type": "BOOLEAN",
-                        "mode": "NULLABLE",
-                        "description": "Total calories consumed.",
-                    },
-                    {
-                        "name": "log_date",
-                        "type": "DATE",
-                        "mode": "NULLABLE",
-                        "description": "Date of the food log.",
-                    },
-                    {
-                        "name": "log_id",
-                        "type": "INTEGER",
-                        "mode": "NULLABLE",
-                        "description": "Food log id.",
-                    },
-                    {
-                        "name": "logged_food_access_level",
-                        "type": "STRING",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_amount",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_brand",
-                        "type": "STRING",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_calories",
-                        "type": "INTEGER",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_food_id",
-                        "type": "INTEGER",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_meal_type_id",
-                        "type": "INTEGER",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_name",
-                        "type": "STRING",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_unit_name",
-                        "type": "STRING",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_unit_plural",
-                        "type": "STRING",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "nutritional_values_calories",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "nutritional_values_carbs",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "nutritional_values_fat",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "nutritional_values_fiber",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "nutritional_values_protein",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "nutritional_values_sodium",
-                        "type": "FLOAT",
-                        "mode": "NULLABLE",
-                    },
-                    {
-                        "name": "logged_food_locale",
-                        "type": "STRING",
-                        "mode": "NULLABLE",
-                    },
-                ],
-            )
+        for endpoint in spec.endpoints:
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+            if (
+                not replay
+                and endpoint.refresh
+                and not _refresh_due(user, endpoint.refresh, date_pulled, force)
+            ):
+                continue
 
-    if len(nutrition_goals_list) > 0:
+            try:
 
-        try:
+                payload = _fetch(endpoint, user, date_pulled, archive, replay)
+
+                if payload is None:
+                    log.debug("%s: %s not archived", user, endpoint.key)
+                    unit.complete = False
+                    continue
+
+                if replay:
+                    if endpoint.empty and endpoint.empty(payload):
+                        break
+                    selected = endpoint.tables
+                else:
+                    selected = _select_tables(
+                        spec,
+                        endpoint,
+                        user,
+                        date_pulled,
+                        payload,
+                        force,
+                        reload,
+                        unit.refreshes,
+                    )
+                    if selected is None:
+                        # nothing to retry for an empty response
+                        unit.empty = True
+                        unit.complete = False
+                        break
+
+                if not selected:
+                    continue
+
+                names = [table.table for table in selected]
+
+                if not replay:
+                    payload_hash = content_hash(payload)
+                    if not reload and ingest_state.content_unchanged(
+                        user, endpoint.key, date_pulled, payload_hash
+                    ):
+                        log.debug("%s: %s unchanged", user, endpoint.key)
+                        continue
+                    unit.hashes[endpoint.key] = (payload_hash, names)
+
+                if pool:
+                    job = pool.submit(
+                        transform_tables,
+                        spec.name,
+                        names,
+                        payload,
+                        user,
+                        date_pulled,
+                    )
+                else:
+                    job = (selected, payload)
+                unit.jobs.append((names, job))
+
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
+                unit.complete = False
+                unit.error = e
+
+        # blocks while the transform stage is queue_size users behind
+        work.put(unit)
 
-            bulk_nutrition_goal_df = pd.concat(nutrition_goals_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_nutrition_goal_df,
-                destination_table=_tablename("nutrition_goals"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "calories",
-                        "type": "INTEGER",
-                        "description": "The users set calorie goal",
-                    },
-                ],
-            )
+    # end loop over users
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    fitbit_stop = timeit.default_timer()
+    log.debug("%s: fitbit done in %f", spec.name, fitbit_stop - start)
 
-    stop = timeit.default_timer()
-    execution_time = stop - start
-    print("Nutrition Scope Loaded " + str(execution_time))
+    if archive:
+        archive.close()
 
-    fitbit_bp.storage.user = None
+    work.put(None)
+    transformer.join()
 
-    return "Nutrition Scope Loaded"
+    for table in tables.values():
+        table.flush()
+    uploader.join()
+
+    _record_loaded(spec, tables, uploader, loaded)
+
+    fitbit_bp.storage.user = None
 
 
 #
-# Heart Data
+# Dead letters
 #
-@bp.route("/fitbit_heart_rate_scope")
-def fitbit_heart_rate_scope():
+@bp.route("/fitbit_retry_dead_letters")
+def fitbit_retry_dead_letters():
+    """re-run the (user, scope, date) units that failed
+
+    each scope with dead letters is run once, for just its failed users
+    and dates, ignoring the ingest state caches.  the responses of a
+    failed unit that were loaded before (their content hash or refresh
+    was recorded) are not loaded again, so only the endpoints that
+    failed are.  units that succeed drop their dead letter, the others
+    record the new failure.  the optional `scope` query param restricts
+    the retry to one scope.
+    """
 
     start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
 
-    pd.set_option("display.max_columns", 500)
+    failed = {}
+    for letter in dead_letters.load(request.args.get("scope")):
+        if letter.get("scope") in SCOPES:
+            failed.setdefault(letter["scope"], []).append(
+                (letter["user"], letter["date"])
+            )
 
-    hr_zones_list = []
-    hr_list = []
+    for scope, user_dates in failed.items():
+        log.debug("%s: retrying %d units", scope, len(user_dates))
+        ingest_state.load_all(list({user for user, _ in user_dates}))
+        _ingest_scope(SCOPES[scope], user_dates, True, reload=False)
 
-    for user in user_list:
+    stop = timeit.default_timer()
+    execution_time = stop - start
+    print("Fitbit Dead Letters Retried " + str(execution_time))
 
-        log.debug("user: %s", user)
+    return "Fitbit Dead Letters Retried"
 
-        fitbit_bp.storage.user = user
 
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
+#
+# Table bootstrap
+#
+@bp.route("/fitbit_bootstrap_tables")
+def fitbit_bootstrap_tables():
+    """create the tables of every scope that do not exist yet
 
-        try:
+    tables are otherwise created by their first load, this creates them
+    up front, partitioned and clustered (see ``create_table`` of the
+    sink).  existing tables are left alone.
+    """
 
-            resp = fitbit.get(
-                "1/user/-/activities/heart/date/" + date_pulled + "/1d.json"
-            )
+    sink = make_sink()
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+    for spec in SCOPES.values():
+        for table in spec.tables:
+            try:
+                sink.create_table(table.table, table.schema)
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
 
-            hr_zones = resp.json()["activities-heart"][0]["value"]
-            zone_list = ["Out of Range", "Fat Burn", "Cardio", "Peak"]
-            hr_zones_columns = [
-                "out_of_range_calories_out",
-                "out_of_range_minutes",
-                "out_of_range_min_hr",
-                "out_of_range_max_hr",
-                "fat_burn_calories_out",
-                "fat_burn_minutes",
-                "fat_burn_min_hr",
-                "fat_burn_max_hr",
-                "cardio_calories_out",
-                "cardio_minutes",
-                "cardio_min_hr",
-                "cardio_max_hr",
-                "peak_calories_out",
-                "peak_minutes",
-                "peak_min_hr",
-                "peak_max_hr",
-            ]
-            hr_zones_df = pd.json_normalize(hr_zones)
-
-            user_activity_zone = pd.DataFrame(
-                {
-                    hr_zones["heartRateZones"][0]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_calories_out": hr_zones["heartRateZones"][0][
-                        "caloriesOut"
-                    ],
-                    hr_zones["heartRateZones"][0]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_minutes": hr_zones["heartRateZones"][0]["minutes"],
-                    hr_zones["heartRateZones"][0]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_min_hr": hr_zones["heartRateZones"][0]["min"],
-                    hr_zones["heartRateZones"][0]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_max_hr": hr_zones["heartRateZones"][0]["max"],
-                    hr_zones["heartRateZones"][1]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_calories_out": hr_zones["heartRateZones"][1][
-                        "caloriesOut"
-                    ],
-                    hr_zones["heartRateZones"][1]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_minutes": hr_zones["heartRateZones"][1]["minutes"],
-                    hr_zones["heartRateZones"][1]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_min_hr": hr_zones["heartRateZones"][1]["min"],
-                    hr_zones["heartRateZones"][1]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_max_hr": hr_zones["heartRateZones"][1]["max"],
-                    hr_zones["heartRateZones"][2]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_calories_out": hr_zones["heartRateZones"][2][
-                        "caloriesOut"
-                    ],
-                    hr_zones["heartRateZones"][2]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_minutes": hr_zones["heartRateZones"][2]["minutes"],
-                    hr_zones["heartRateZones"][2]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_min_hr": hr_zones["heartRateZones"][2]["min"],
-                    hr_zones["heartRateZones"][2]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_max_hr": hr_zones["heartRateZones"][2]["max"],
-                    hr_zones["heartRateZones"][3]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_calories_out": hr_zones["heartRateZones"][3][
-                        "caloriesOut"
-                    ],
-                    hr_zones["heartRateZones"][3]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_minutes": hr_zones["heartRateZones"][3]["minutes"],
-                    hr_zones["heartRateZones"][3]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_min_hr": hr_zones["heartRateZones"][3]["min"],
-                    hr_zones["heartRateZones"][3]["name"]
-                    .replace(" ", "_")
-                    .lower()
-                    + "_max_hr": hr_zones["heartRateZones"][3]["max"],
-                },
-                index=[0],
-            )
+    return "Fitbit Tables Created"
 
-            user_activity_zone.insert(0, "id", user)
-            user_activity_zone.insert(1, "date", date_pulled)
-            hr_zones_list.append(user_activity_zone)
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+#
+# Chunk 1: Badges, Social, Device
+#
+@bp.route("/fitbit_chunk_1")
+def fitbit_chunk_1():
 
-        try:
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-            resp = fitbit.get(
-                "/1/user/-/activities/heart/date/" + date_pulled + "/1d.json"
-            )
+    _ingest_scope(SCOPES["chunk_1"], _user_dates(), force, replay)
 
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
+    stop = timeit.default_timer()
+    execution_time = stop - start
+    print("Fitbit Chunk Loaded " + str(execution_time))
 
-            hr_columns = ["time", "value"]
+    return "Fitbit Chunk Loaded"
 
-            respj = resp.json()
-            assert (
-                "activities-heart-intraday" in respj
-            ), "no intraday heart rate data returned"
-            heart_rate = respj["activities-heart-intraday"]["dataset"]
-            heart_rate_df = pd.json_normalize(heart_rate)
-            heart_rate_df = _normalize_response(
-                heart_rate_df, hr_columns, user, date_pulled
-            )
-            heart_rate_df["datetime"] = pd.to_datetime(
-                heart_rate_df["date"] + " " + heart_rate_df["time"]
-            )
-            try:
-                heart_rate_df = heart_rate_df.drop(["time"], axis=1)
-            except:
-                pass
 
-            hr_list.append(heart_rate_df)
+#
+# Body and Weight
+#
+@bp.route("/fitbit_body_weight")
+def fitbit_body_weight():
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-    # end loop over users
+    _ingest_scope(
+        SCOPES["body_weight"], _user_dates("body_weight"), force, replay
+    )
 
-    #### CONCAT DATAFRAMES INTO BULK DF ####
+    stop = timeit.default_timer()
+    execution_time = stop - start
+    print("Body & Weight Scope Loaded " + str(execution_time))
 
-    load_stop = timeit.default_timer()
-    time_to_load = load_stop - start
-    print("Heart Rate Zones " + str(time_to_load))
+    return "Body & Weight Scope Loaded"
 
-    ######## LOAD DATA INTO BIGQUERY #########
-    if len(hr_zones_list) > 0:
 
-        try:
+#
+# Nutrition Data
+#
+@bp.route("/fitbit_nutrition_scope")
+def fitbit_nutrition_scope():
 
-            bulk_hr_zones_df = pd.concat(hr_zones_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_hr_zones_df,
-                destination_table=_tablename("heart_rate_zones"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "out_of_range_calories_out",
-                        "type": "FLOAT",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "out_of_range_minutes",
-                        "type": "INTEGER",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "out_of_range_min_hr",
-                        "type": "INTEGER",
-                        "description": "Minimum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "out_of_range_max_hr",
-                        "type": "INTEGER",
-                        "description": "Maximum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "fat_burn_calories_out",
-                        "type": "FLOAT",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "fat_burn_minutes",
-                        "type": "INTEGER",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "fat_burn_min_hr",
-                        "type": "INTEGER",
-                        "description": "Minimum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "fat_burn_max_hr",
-                        "type": "INTEGER",
-                        "description": "Maximum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "cardio_calories_out",
-                        "type": "FLOAT",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "cardio_minutes",
-                        "type": "INTEGER",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "cardio_min_hr",
-                        "type": "INTEGER",
-                        "description": "Minimum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "cardio_max_hr",
-                        "type": "INTEGER",
-                        "description": "Maximum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "peak_calories_out",
-                        "type": "FLOAT",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "peak_minutes",
-                        "type": "INTEGER",
-                        "description": "Number calories burned with the specified heart rate zone.",
-                    },
-                    {
-                        "name": "peak_min_hr",
-                        "type": "INTEGER",
-                        "description": "Minimum range for the heart rate zone.",
-                    },
-                    {
-                        "name": "peak_max_hr",
-                        "type": "INTEGER",
-                        "description": "Maximum range for the heart rate zone.",
-                    },
-                ],
-            )
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    _ingest_scope(SCOPES["nutrition"], _user_dates("nutrition"), force, replay)
+
+    stop = timeit.default_timer()
+    execution_time = stop - start
+    print("Nutrition Scope Loaded " + str(execution_time))
 
-    if len(hr_list) > 0:
+    return "Nutrition Scope Loaded"
 
-        try:
 
-            bulk_hr_intraday_df = pd.concat(hr_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_hr_intraday_df,
-                destination_table=_tablename("heart_rate"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "datetime",
-                        "type": "TIMESTAMP",
-                    },
-                    {
-                        "name": "value",
-                        "type": "INTEGER",
-                    },
-                    {"name": "date_time", "type": "TIMESTAMP"},
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+#
+# Heart Data
+#
+@bp.route("/fitbit_heart_rate_scope")
+def fitbit_heart_rate_scope():
+
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
+
+    _ingest_scope(
+        SCOPES["heart_rate"], _user_dates("heart_rate"), force, replay
+    )
 
     stop = timeit.default_timer()
     execution_time = stop - start
     print("Heart Rate Scope Loaded " + str(execution_time))
 
-    fitbit_bp.storage.user = None
-
     return "Heart Rate Scope Loaded"
 
 
@@ -1315,394 +1009,16 @@ def fitbit_heart_rate_scope():
 def fitbit_activity_scope():
 
     start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
+    _ingest_scope(SCOPES["activity"], _user_dates("activity"), force, replay)
 
-    pd.set_option("display.max_columns", 500)
-
-    activities_list = []
-    activity_summary_list = []
-    activity_distance_list = []
-    activity_goals_list = []
-    omh_activity_list = []
-
-    for user in user_list:
-
-        log.debug("user: %s", user)
-
-        fitbit_bp.storage.user = user
-
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
-
-        try:
-
-            resp = fitbit.get(
-                "/1/user/-/activities/date/" + date_pulled + ".json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            # subset response for activites, summary, and goals
-            activity_goals = resp.json()["goals"]
-            activities = resp.json()["activities"]
-            activity_summary = resp.json()["summary"]
-
-            activity_goals_df = pd.json_normalize(activity_goals)
-            activity_goals_columns = [
-                "activeMinutes",
-                "caloriesOut",
-                "distance",
-                "floors",
-                "steps",
-            ]
-            activity_goals_df = _normalize_response(
-                activity_goals_df, activity_goals_columns, user, date_pulled
-            )
-
-            # activity_distances = resp.json()["summary"]["distances"]
-            # activity_distances_df = pd.json_normalize(activity_distances)
-            # activity_distances_columns = [
-            #     "activity",
-            #     "total_distance",
-            #     "tracker_distance",
-            #     "logged_activites_distance",
-            #     "very_active_distance",
-            #     "moderetly_active_distance",
-            #     "lightly_active_distance",
-            #     "sedentary_active_distance",
-            # ]
-
-            activities_df = pd.json_normalize(activities)
-            # Define columns
-            activites_columns = [
-                "activityId",
-                "activityParentId",
-                "activityParentName",
-                "calories",
-                "description",
-                "distance",
-                "duration",
-                "hasActiveZoneMinutes",
-                "hasStartTime",
-                "isFavorite",
-                "lastModified",
-                "logId",
-                "name",
-                "startDate",
-                "startTime",
-                "steps",
-            ]
-            activities_df = _normalize_response(
-                activities_df, activites_columns, user, date_pulled
-            )
-            activities_df["start_datetime"] = pd.to_datetime(
-                activities_df["start_date"] + " " + activities_df["start_time"]
-            )
-            activities_df = activities_df.drop(
-                ["start_date", "start_time", "last_modified"], axis=1
-            )
-
-            activity_summary_df = pd.json_normalize(activity_summary)
-            try:
-                activity_summary_df = activity_summary_df.drop(
-                    ["distances", "heartRateZones"], axis=1
-                )
-            except:
-                pass
-
-            activity_summary_columns = [
-                "activeScore",
-                "activityCalories",
-                "caloriesBMR",
-                "caloriesOut",
-                "elevation",
-                "fairlyActiveMinutes",
-                "floors",
-                "lightlyActiveMinutes",
-                "marginalCalories",
-                "restingHeartRate",
-                "sedentaryMinutes",
-                "steps",
-                "veryActiveMinutes",
-            ]
-
-            activity_summary_df = _normalize_response(
-                activity_summary_df, activity_summary_columns, user, date_pulled
-            )
-
-            # Append dfs to df list
-            activities_list.append(activities_df)
-            activity_summary_list.append(activity_summary_df)
-            activity_goals_list.append(activity_goals_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    fitbit_stop = timeit.default_timer()
-    fitbit_execution_time = fitbit_stop - start
-    print("Activity Scope: " + str(fitbit_execution_time))
-
-    # bulk_omh_activity_df = pd.concat(omh_activity_list, axis=0)
-
-    if len(activities_list) > 0:
-
-        try:
-
-            bulk_activities_df = pd.concat(activities_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_activities_df,
-                destination_table=_tablename("activity_logs"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "activity_id",
-                        "type": "INTEGER",
-                        "description": "The ID of the activity.",
-                    },
-                    {
-                        "name": "activity_parent_id",
-                        "type": "INTEGER",
-                        "description": 'The ID of the top level ("parent") activity.',
-                    },
-                    {
-                        "name": "activity_parent_name",
-                        "type": "STRING",
-                        "description": 'The name of the top level ("parent") activity.',
-                    },
-                    {
-                        "name": "calories",
-                        "type": "INTEGER",
-                        "description": "Number of calories burned during the exercise.",
-                    },
-                    {
-                        "name": "description",
-                        "type": "STRING",
-                        "description": "The description of the recorded exercise.",
-                    },
-                    {
-                        "name": "distance",
-                        "type": "FLOAT",
-                        "description": "The distance traveled during the recorded exercise.",
-                    },
-                    {
-                        "name": "duration",
-                        "type": "INTEGER",
-                        "description": "The activeDuration (milliseconds) + any pauses that occurred during the activity recording.",
-                    },
-                    {
-                        "name": "has_active_zone_minutes",
-                        "type": "BOOLEAN",
-                        "description": "True | False",
-                    },
-                    {
-                        "name": "has_start_time",
-                        "type": "BOOLEAN",
-                        "description": "True | False",
-                    },
-                    {
-                        "name": "is_favorite",
-                        "type": "BOOLEAN",
-                        "description": "True | False",
-                    },
-                    # {'name': 'last_modified', 'type': 'TIMESTAMP', 'description':'Timestamp the exercise was last modified.'},
-                    {
-                        "name": "log_id",
-                        "type": "INTEGER",
-                        "description": "The activity log identifier for the exercise.",
-                    },
-                    {
-                        "name": "name",
-                        "type": "STRING",
-                        "description": "Name of the recorded exercise.",
-                    },
-                    {
-                        "name": "start_datetime",
-                        "type": "TIMESTAMP",
-                        "description": "The start time of the recorded exercise.",
-                    },
-                    {
-                        "name": "steps",
-                        "type": "INTEGER",
-                        "description": "User defined goal for daily step count.",
-                    },
-                ],
-            )
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(activity_summary_list) > 0:
-
-        try:
-
-            bulk_activity_summary_df = pd.concat(activity_summary_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_activity_summary_df,
-                destination_table=_tablename("activity_summary"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "activity_score",
-                        "type": "INTEGER",
-                        "description": "No Description",
-                    },
-                    {
-                        "name": "activity_calories",
-                        "type": "INTEGER",
-                        "description": "The number of calories burned for the day during periods the user was active above sedentary level. This includes both activity burned calories and BMR.",
-                    },
-                    {
-                        "name": "calories_bmr",
-                        "type": "INTEGER",
-                        "description": "Total BMR calories burned for the day.",
-                    },
-                    {
-                        "name": "calories_out",
-                        "type": "INTEGER",
-                        "description": "Total calories burned for the day (daily timeseries total).",
-                    },
-                    {
-                        "name": "elevation",
-                        "type": "INTEGER",
-                        "description": "The elevation traveled for the day.",
-                    },
-                    {
-                        "name": "fairly_active_minutes",
-                        "type": "INTEGER",
-                        "description": "Total minutes the user was fairly/moderately active.",
-                    },
-                    {
-                        "name": "floors",
-                        "type": "INTEGER",
-                        "description": "The equivalent floors climbed for the day.",
-                    },
-                    {
-                        "name": "lightly_active_minutes",
-                        "type": "INTEGER",
-                        "description": "	Total minutes the user was lightly active.",
-                    },
-                    {
-                        "name": "marginal_calories",
-                        "type": "INTEGER",
-                        "description": "Total marginal estimated calories burned for the day.",
-                    },
-                    {
-                        "name": "resting_heart_rate",
-                        "type": "INTEGER",
-                        "description": "The resting heart rate for the day",
-                    },
-                    {
-                        "name": "sedentary_minutes",
-                        "type": "INTEGER",
-                        "description": "Total minutes the user was sedentary.",
-                    },
-                    {
-                        "name": "very_active_minutes",
-                        "type": "INTEGER",
-                        "description": "Total minutes the user was very active.",
-                    },
-                    {
-                        "name": "steps",
-                        "type": "INTEGER",
-                        "description": "Total steps taken for the day.",
-                    },
-                ],
-            )
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(activity_goals_list) > 0:
-
-        try:
-
-            bulk_activity_goals_df = pd.concat(activity_goals_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_activity_goals_df,
-                destination_table=_tablename("activity_goals"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "active_minutes",
-                        "type": "INTEGER",
-                        "description": "User defined goal for daily active minutes.",
-                    },
-                    {
-                        "name": "calories_out",
-                        "type": "INTEGER",
-                        "description": "User defined goal for daily calories burned.",
-                    },
-                    {
-                        "name": "distance",
-                        "type": "FLOAT",
-                        "description": "User defined goal for daily distance traveled.",
-                    },
-                    {
-                        "name": "floors",
-                        "type": "INTEGER",
-                        "description": "User defined goal for daily floor count.",
-                    },
-                    {
-                        "name": "steps",
-                        "type": "INTEGER",
-                        "description": "User defined goal for daily step count.",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    stop = timeit.default_timer()
-    execution_time = stop - start
-    print("Activity Scope Loaded: " + str(execution_time))
-
-    fitbit_bp.storage.user = None
+    stop = timeit.default_timer()
+    execution_time = stop - start
+    print("Activity Scope Loaded: " + str(execution_time))
 
     return "Activity Scope Loaded"
 
@@ -1714,392 +1030,17 @@ def fitbit_activity_scope():
 def fitbit_intraday_scope():
 
     start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
-
-    pd.set_option("display.max_columns", 500)
-
-    intraday_steps_list = []
-    intraday_calories_list = []
-    intraday_distance_list = []
-    intraday_elevation_list = []
-    intraday_floors_list = []
-
-    for user in user_list:
-
-        log.debug("user: %s", user)
-
-        fitbit_bp.storage.user = user
-
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
-
-        try:
-
-            resp = fitbit.get(
-                "/1/user/-/activities/steps/date/"
-                + date_pulled
-                + "/1d/1min.json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            intraday_steps = resp.json()["activities-steps-intraday"]["dataset"]
-            intraday_steps_df = pd.json_normalize(intraday_steps)
-            intraday_steps_columns = ["time", "value"]
-            intraday_steps_df = _normalize_response(
-                intraday_steps_df, intraday_steps_columns, user, date_pulled
-            )
-            intraday_steps_df["date_time"] = pd.to_datetime(
-                date_pulled + " " + intraday_steps_df["time"]
-            )
-            intraday_steps_df = intraday_steps_df.drop(["time"], axis=1)
-            intraday_steps_list.append(intraday_steps_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-        try:
-            #
-            # CALORIES
-            resp = fitbit.get(
-                "/1/user/-/activities/calories/date/"
-                + date_pulled
-                + "/1d/1min.json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            intraday_calories = resp.json()["activities-calories-intraday"][
-                "dataset"
-            ]
-            intraday_calories_df = pd.json_normalize(intraday_calories)
-            intraday_calories_columns = ["level", "mets", "time", "value"]
-            intraday_calories_df = _normalize_response(
-                intraday_calories_df,
-                intraday_calories_columns,
-                user,
-                date_pulled,
-            )
-            intraday_calories_df["date_time"] = pd.to_datetime(
-                date_pulled + " " + intraday_calories_df["time"]
-            )
-            intraday_calories_df = intraday_calories_df.drop(["time"], axis=1)
-            intraday_calories_list.append(intraday_calories_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-        try:
-            # DISTANCE
-            resp = fitbit.get(
-                "/1/user/-/activities/distance/date/"
-                + date_pulled
-                + "/1d/1min.json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            intraday_distance = resp.json()["activities-distance-intraday"][
-                "dataset"
-            ]
-            intraday_distance_df = pd.json_normalize(intraday_distance)
-            intraday_calories_columns = ["time", "value"]
-            intraday_distance_df = _normalize_response(
-                intraday_distance_df,
-                intraday_calories_columns,
-                user,
-                date_pulled,
-            )
-            intraday_distance_df["date_time"] = pd.to_datetime(
-                date_pulled + " " + intraday_distance_df["time"]
-            )
-            intraday_distance_df = intraday_distance_df.drop(["time"], axis=1)
-            intraday_distance_list.append(intraday_distance_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-        try:
-            # ELEVATION
-            resp = fitbit.get(
-                "/1/user/-/activities/elevation/date/"
-                + date_pulled
-                + "/1d/1min.json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            intraday_elevation = resp.json()["activities-elevation-intraday"][
-                "dataset"
-            ]
-            intraday_elevation_df = pd.json_normalize(intraday_elevation)
-            intraday_elevation_columns = ["time", "value"]
-            intraday_elevation_df = _normalize_response(
-                intraday_elevation_df,
-                intraday_elevation_columns,
-                user,
-                date_pulled,
-            )
-            intraday_elevation_df["date_time"] = pd.to_datetime(
-                date_pulled + " " + intraday_elevation_df["time"]
-            )
-            intraday_elevation_df = intraday_elevation_df.drop(["time"], axis=1)
-            intraday_elevation_list.append(intraday_elevation_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-        try:
-            # FLOORS
-            resp = fitbit.get(
-                "/1/user/-/activities/floors/date/"
-                + date_pulled
-                + "/1d/1min.json"
-            )
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            intraday_floors = resp.json()["activities-floors-intraday"][
-                "dataset"
-            ]
-            intraday_floors_df = pd.json_normalize(intraday_floors)
-            intraday_floors_columns = ["time", "value"]
-            intraday_floors_df = _normalize_response(
-                intraday_floors_df, intraday_floors_columns, user, date_pulled
-            )
-            intraday_floors_df["date_time"] = pd.to_datetime(
-                date_pulled + " " + intraday_floors_df["time"]
-            )
-            intraday_floors_df = intraday_floors_df.drop(["time"], axis=1)
-            intraday_floors_list.append(intraday_floors_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    # end loop over users
-
-    fitbit_stop = timeit.default_timer()
-    fitbit_execution_time = fitbit_stop - start
-    print("Intraday Scope: " + str(fitbit_execution_time))
-
-    if len(intraday_steps_list) > 0:
-
-        try:
-
-            bulk_intraday_steps_df = pd.concat(intraday_steps_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_intraday_steps_df,
-                destination_table=_tablename("intraday_steps"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "value",
-                        "type": "INTEGER",
-                        "description": "Number of steps at this time",
-                    },
-                    {
-                        "name": "date_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time of day",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(intraday_calories_list) > 0:
-
-        try:
-
-            bulk_intraday_calories_df = pd.concat(
-                intraday_calories_list, axis=0
-            )
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_intraday_calories_df,
-                destination_table=_tablename("intraday_calories"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {"name": "level", "type": "INTEGER"},
-                    {
-                        "name": "mets",
-                        "type": "INTEGER",
-                        "description": "METs value at the moment when the resource was recorded.",
-                    },
-                    {
-                        "name": "value",
-                        "type": "FLOAT",
-                        "description": "The specified resource's value at the time it is recorded.",
-                    },
-                    {
-                        "name": "date_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time of day",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(intraday_distance_list) > 0:
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-        try:
-
-            bulk_intraday_distance_df = pd.concat(
-                intraday_distance_list, axis=0
-            )
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_intraday_distance_df,
-                destination_table=_tablename("intraday_distances"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "value",
-                        "type": "FLOAT",
-                        "description": "The specified resource's value at the time it is recorded.",
-                    },
-                    {
-                        "name": "date_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time of day",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(intraday_elevation_list) > 0:
-
-        try:
-
-            bulk_intraday_elevation_df = pd.concat(
-                intraday_elevation_list, axis=0
-            )
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_intraday_elevation_df,
-                destination_table=_tablename("intraday_elevation"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "value",
-                        "type": "FLOAT",
-                        "description": "The specified resource's value at the time it is recorded.",
-                    },
-                    {
-                        "name": "date_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time of day",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(intraday_floors_list) > 0:
-
-        try:
-
-            bulk_intraday_floors_df = pd.concat(intraday_floors_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_intraday_floors_df,
-                destination_table=_tablename("intraday_floors"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "value",
-                        "type": "FLOAT",
-                        "description": "The specified resource's value at the time it is recorded.",
-                    },
-                    {
-                        "name": "date_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time of day",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    _ingest_scope(SCOPES["intraday"], _user_dates("intraday"), force, replay)
 
     stop = timeit.default_timer()
     execution_time = stop - start
     print("Intraday Scope Loaded: " + str(execution_time))
 
-    fitbit_bp.storage.user = None
-
     return "Intraday Scope Loaded"
 
 
@@ -2108,342 +1049,19 @@ def fitbit_intraday_scope():
 #
 @bp.route("/fitbit_sleep_scope")
 def fitbit_sleep_scope():
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
-
-    pd.set_option("display.max_columns", 500)
-
-    sleep_list = []
-    sleep_summary_list = []
-    sleep_minutes_list = []
-    # omh_sleep_list = []
-
-    for user in user_list:
-
-        log.debug("user: %s", user)
-
-        fitbit_bp.storage.user = user
-
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
-
-        try:
-
-            resp = fitbit.get("/1/user/-/sleep/date/" + date_pulled + ".json")
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            sleep = resp.json()["sleep"]
-
-            # if "minuteData" in resp.json().keys():
-            #     sleep_minutes = resp.json()["sleep"][0]["minuteData"]
-            #     sleep_minutes_df = pd.json_normalize(sleep_minutes)
-            #     sleep_minutes_columns = ["dateTime", "value"]
-            #     sleep_minutes_df = _normalize_response(
-            #         sleep_minutes_df, sleep_minutes_columns, user, date_pulled
-            #     )
-            # else:
-            #     cols = ["dateTime", "value"]
-            #     sleep_minutes_df = pd.DataFrame(columns=cols)
-            #     sleep_minutes_df = _normalize_response(
-            #         sleep_minutes_df, cols, user, date_pulled
-            #     )
-            # sleep_minutes_df["date_time"] = pd.to_datetime(
-            #     date_pulled + " " + sleep_minutes_df["date_time"]
-            # )
-            # sleep_minutes_list.append(sleep_minutes_df)
-
-            sleep_summary = resp.json()["summary"]
-            sleep_df = pd.json_normalize(sleep)
-            sleep_summary_df = pd.json_normalize(sleep_summary)
-
-            try:
-                sleep_df = sleep_df.drop(["minuteData"], axis=1)
-            except:
-                pass
-
-            sleep_columns = [
-                "awakeCount",
-                "awakeDuration",
-                "awakeningsCount",
-                "dateOfSleep",
-                "duration",
-                "efficiency",
-                "endTime",
-                "isMainSleep",
-                "logId",
-                "minutesAfterWakeup",
-                "minutesAsleep",
-                "minutesAwake",
-                "minutesToFallAsleep",
-                "restlessCount",
-                "restlessDuration",
-                "startTime",
-                "timeInBed",
-            ]
-            sleep_summary_columns = [
-                "totalMinutesAsleep",
-                "totalSleepRecords",
-                "totalTimeInBed",
-                "stages.deep",
-                "stages.light",
-                "stages.rem",
-                "stages.wake",
-            ]
-
-            # Fill missing columns
-            sleep_df = _normalize_response(
-                sleep_df, sleep_columns, user, date_pulled
-            )
-            sleep_df["end_time"] = pd.to_datetime(
-                date_pulled + " " + sleep_df["end_time"]
-            )
-            sleep_df["start_time"] = pd.to_datetime(
-                date_pulled + " " + sleep_df["start_time"]
-            )
-
-            sleep_summary_df = _normalize_response(
-                sleep_summary_df, sleep_summary_columns, user, date_pulled
-            )
-
-            # Append dfs to df list
-            sleep_list.append(sleep_df)
-            sleep_summary_list.append(sleep_summary_df)
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    # end loop over users
-
-    fitbit_stop = timeit.default_timer()
-    fitbit_execution_time = fitbit_stop - start
-    print("Sleep Scope: " + str(fitbit_execution_time))
-
-    if len(sleep_list) > 0:
-
-        try:
-
-            bulk_sleep_df = pd.concat(sleep_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_sleep_df,
-                destination_table=_tablename("sleep"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "awake_count",
-                        "type": "INTEGER",
-                        "description": "Number of times woken up",
-                    },
-                    {
-                        "name": "awake_duration",
-                        "type": "INTEGER",
-                        "description": "Amount of time the user was awake",
-                    },
-                    {
-                        "name": "awakenings_count",
-                        "type": "INTEGER",
-                        "description": "Number of times woken up",
-                    },
-                    {
-                        "name": "date_of_sleep",
-                        "type": "DATE",
-                        "description": "The date the user fell asleep",
-                    },
-                    {
-                        "name": "duration",
-                        "type": "INTEGER",
-                        "description": "Length of the sleep in milliseconds.",
-                    },
-                    {
-                        "name": "efficiency",
-                        "type": "INTEGER",
-                        "description": "Calculated sleep efficiency score. This is not the sleep score available in the mobile application.",
-                    },
-                    {
-                        "name": "end_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time the sleep log ended.",
-                    },
-                    {
-                        "name": "is_main_sleep",
-                        "type": "BOOLEAN",
-                        "decription": "True | False",
-                    },
-                    {
-                        "name": "log_id",
-                        "type": "INTEGER",
-                        "description": "Sleep log ID.",
-                    },
-                    {
-                        "name": "minutes_after_wakeup",
-                        "type": "INTEGER",
-                        "description": "The total number of minutes after the user woke up.",
-                    },
-                    {
-                        "name": "minutes_asleep",
-                        "type": "INTEGER",
-                        "description": "The total number of minutes the user was asleep.",
-                    },
-                    {
-                        "name": "minutes_awake",
-                        "type": "INTEGER",
-                        "description": "The total number of minutes the user was awake.",
-                    },
-                    {
-                        "name": "minutes_to_fall_asleep",
-                        "type": "INTEGER",
-                        "decription": "The total number of minutes before the user falls asleep. This value is generally 0 for autosleep created sleep logs.",
-                    },
-                    {
-                        "name": "restless_count",
-                        "type": "INTEGER",
-                        "decription": "The total number of times the user was restless",
-                    },
-                    {
-                        "name": "restless_duration",
-                        "type": "INTEGER",
-                        "decription": "The total amount of time the user was restless",
-                    },
-                    {
-                        "name": "start_time",
-                        "type": "TIMESTAMP",
-                        "description": "Time the sleep log begins.",
-                    },
-                    {
-                        "name": "time_in_bed",
-                        "type": "INTEGER",
-                        "description": "Total number of minutes the user was in bed.",
-                    },
-                ],
-            )
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(sleep_minutes_list) > 0:
-
-        try:
-
-            bulk_sleep_minutes_df = pd.concat(sleep_minutes_list, axis=0)
-            bulk_sleep_minutes_df["value"] = bulk_sleep_minutes_df[
-                "value"
-            ].astype(int)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_sleep_minutes_df,
-                destination_table=_tablename("sleep_minutes"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {"name": "date_time", "type": "TIMESTAMP"},
-                    {"name": "value", "type": "INTEGER"},
-                ],
-            )
-
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
-
-    if len(sleep_summary_list) > 0:
 
-        try:
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-            bulk_sleep_summary_df = pd.concat(sleep_summary_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_sleep_summary_df,
-                destination_table=_tablename("sleep_summary"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "total_minutes_asleep",
-                        "type": "INTEGER",
-                        "description": "Total number of minutes the user was asleep across all sleep records in the sleep log.",
-                    },
-                    {
-                        "name": "total_sleep_records",
-                        "type": "INTEGER",
-                        "description": "The number of sleep records within the sleep log.",
-                    },
-                    {
-                        "name": "total_time_in_bed",
-                        "type": "INTEGER",
-                        "description": "Total number of minutes the user was in bed across all records in the sleep log.",
-                    },
-                    {
-                        "name": "stages_deep",
-                        "type": "INTEGER",
-                        "description": "Total time of deep sleep",
-                    },
-                    {
-                        "name": "stages_light",
-                        "type": "INTEGER",
-                        "description": "Total time of light sleep",
-                    },
-                    {
-                        "name": "stages_rem",
-                        "type": "INTEGER",
-                        "description": "Total time of REM sleep",
-                    },
-                    {
-                        "name": "stages_wake",
-                        "type": "INTEGER",
-                        "description": "Total time awake",
-                    },
-                ],
-            )
-        except (Exception) as e:
-            log.error("exception occured: %s", str(e))
+    _ingest_scope(SCOPES["sleep"], _user_dates("sleep"), force, replay)
 
     stop = timeit.default_timer()
     execution_time = stop - start
     print("Sleep Scope Loaded: " + str(execution_time))
 
-    fitbit_bp.storage.user = None
-
     return "Sleep Scope Loaded"
 
 
@@ -2452,217 +1070,42 @@ def fitbit_sleep_scope():
 #
 @bp.route("/fitbit_spo2_scope")
 def fitbit_spo2_scope():
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
-
-    pd.set_option("display.max_columns", 500)
-
-    spo2_list = []
-
-    for user in user_list:
-
-        log.debug("user: %s", user)
-
-        fitbit_bp.storage.user = user
-
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
-
-        try:
-
-            resp = fitbit.get(f"/1/user/-/spo2/date/{date_pulled}.json")
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            spo2 = resp.json()["value"]
-            spo2_df = pd.json_normalize(spo2)
-
-            spo2_columns = [
-                "avg",
-                "min",
-                "max",
-            ]
-
-            # Fill missing columns
-            spo2_df = _normalize_response(
-                spo2_df, spo2_columns, user, date_pulled
-            )
-
-            # Append dfs to df list
-            spo2_list.append(spo2_df)
-
-        except (Exception) as e:
-            log.error("spo2 exception occured: %s", str(e))
 
-    # end loop over users
-
-    fitbit_stop = timeit.default_timer()
-    fitbit_execution_time = fitbit_stop - start
-    print("spo2 Scope: " + str(fitbit_execution_time))
-
-    if len(spo2_list) > 0:
-
-        try:
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-            bulk_spo2_df = pd.concat(spo2_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_spo2_df,
-                destination_table=_tablename("spo2"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "avg",
-                        "type": "FLOAT",
-                        "description": "The mean of the 1 minute SpO2 levels calculated as a percentage value.",
-                    },
-                    {
-                        "name": "min",
-                        "type": "FLOAT",
-                        "description": "The minimum daily SpO2 level calculated as a percentage value.",
-                    },
-                    {
-                        "name": "max",
-                        "type": "FLOAT",
-                        "description": "The maximum daily SpO2 level calculated as a percentage value.",
-                    },
-                ],
-            )
+    _ingest_scope(SCOPES["spo2"], _user_dates("spo2"), force, replay)
 
-        except (Exception) as e:
-            log.error("spo2 exception occured: %s", str(e))
-
-    
     stop = timeit.default_timer()
     execution_time = stop - start
     print("spo2 Scope Loaded: " + str(execution_time))
 
-    fitbit_bp.storage.user = None
-
     return "sp02 Scope Loaded"
 
+
 #
 # SPO2 intraday
 #
 @bp.route("/fitbit_spo2_intraday_scope")
 def fitbit_spo2_intraday_scope():
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
-
-    pd.set_option("display.max_columns", 500)
-
-    spo2_list = []
-
-    for user in user_list:
-
-        log.debug("user: %s", user)
-
-        fitbit_bp.storage.user = user
-
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
-
-        try:
-
-            resp = fitbit.get(f"/1/user/-/spo2/date/{date_pulled}/all.json")
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            spo2 = resp.json()["minutes"]
-            spo2_df = pd.json_normalize(spo2)
-
-            spo2_columns = [
-                "value",
-                "minute"
-            ]
-
-            # Fill missing columns
-            spo2_df = _normalize_response(
-                spo2_df, spo2_columns, user, date_pulled
-            )
-
-            # Append dfs to df list
-            spo2_list.append(spo2_df)
-
-        except (Exception) as e:
-            log.error("spo2 exception occured: %s", str(e))
-
-    # end loop over users
-
-    fitbit_stop = timeit.default_timer()
-    fitbit_execution_time = fitbit_stop - start
-    print("spo2 Scope: " + str(fitbit_execution_time))
-
-    if len(spo2_list) > 0:
 
-        try:
-
-            bulk_spo2_df = pd.concat(spo2_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_spo2_df,
-                destination_table=_tablename("spo2_intraday"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "value",
-                        "type": "FLOAT",
-                        "description": "The percentage value of SpO2 calculated at a specific date and time in a single day.",
-                    },
-                    {
-                        "name": "minute",
-                        "type": "DATETIME",
-                        "description": "The date and time at which the SpO2 measurement was taken.",
-                    }
-                ],
-            )
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-        except (Exception) as e:
-            log.error("spo2 exception occured: %s", str(e))
+    _ingest_scope(
+        SCOPES["spo2_intraday"], _user_dates("spo2_intraday"), force, replay
+    )
 
-    
     stop = timeit.default_timer()
     execution_time = stop - start
     print("spo2 Scope Loaded: " + str(execution_time))
 
-    fitbit_bp.storage.user = None
-
     return "sp02 Scope Loaded"
 
 
@@ -2671,109 +1114,17 @@ def fitbit_spo2_intraday_scope():
 #
 @bp.route("/fitbit_temp_scope")
 def fitbit_temp_scope():
-    start = timeit.default_timer()
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-    # if caller provided date as query params, use that otherwise use yesterday
-    date_pulled = request.args.get("date", _date_pulled())
-    user_list = fitbit_bp.storage.all_users()
-    if request.args.get("user") in user_list:
-        user_list = [request.args.get("user")]
-
-    pd.set_option("display.max_columns", 500)
-
-    temp_list = []
-
-    for user in user_list:
-
-        log.debug("user: %s", user)
-
-        fitbit_bp.storage.user = user
-
-        if fitbit_bp.session.token:
-            del fitbit_bp.session.token
-
-        try:
-            resp = fitbit.get(f"/1/user/-/temp/skin/date/{date_pulled}.json")
-
-            log.debug("%s: %d [%s]", resp.url, resp.status_code, resp.reason)
-
-            temp = resp.json()["tempSkin"]
-            temp_df = pd.json_normalize(temp)
-
-            temp_columns = [
-                "dateTime",
-                "logType",
-                "value.nightlyRelative"
-            ]
-
-            # Fill missing columns
-            temp_df = _normalize_response(
-                temp_df, temp_columns, user, date_pulled
-            )
-
-            # Append dfs to df list
-            temp_list.append(temp_df)
-
-        except (Exception) as e:
-            log.error("temp exception occured: %s", str(e))
-
-    # end loop over users
-
-    fitbit_stop = timeit.default_timer()
-    fitbit_execution_time = fitbit_stop - start
-    print("temp Scope: " + str(fitbit_execution_time))
-
-    if len(temp_list) > 0:
-
-        try:
 
-            bulk_temp_df = pd.concat(temp_list, axis=0)
-
-            pandas_gbq.to_gbq(
-                dataframe=bulk_temp_df,
-                destination_table=_tablename("skintemp"),
-                project_id=project_id,
-                if_exists="append",
-                table_schema=[
-                    {
-                        "name": "id",
-                        "type": "STRING",
-                        "mode": "REQUIRED",
-                        "description": "Primary Key",
-                    },
-                    {
-                        "name": "date",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "The date values were extracted",
-                    },
-                    {
-                        "name": "dateTime",
-                        "type": "DATE",
-                        "mode": "REQUIRED",
-                        "description": "the date of the measurements",
-                    },
-                    {
-                        "name": "logType",
-                        "type": "FLOAT",
-                        "description": "The type of skin temperature log created",
-                    },
-                    {
-                        "name": "value.nightlyRelative",
-                        "type": "FLOAT",
-                        "description": "The user's average temperature during a period of sleep.",
-                    },
-                ],
-            )
+    start = timeit.default_timer()
+    # if caller provided force as query param, ignore the ingest caches
+    force = "force" in request.args
+    # if caller provided replay, rebuild the tables from the archive
+    replay = "replay" in request.args
 
-        except (Exception) as e:
-            log.error("temp exception occured: %s", str(e))
+    _ingest_scope(SCOPES["temp"], _user_dates("temp"), force, replay)
 
-    
     stop = timeit.default_timer()
     execution_time = stop - start
     print("temp Scope Loaded: " + str(execution_time))
 
-    fitbit_bp.storage.user = None
-
-    return "temp Scope Loaded"
\ No newline at end of file
+    return "temp Scope Loaded"
@@ -0,0 +1,801 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Declarative description of the fitbit scopes and their tables.
+
+Module provides the registry driving the ingestion engine in
+``app.fitbit_ingest``: every scope (``ScopeSpec``) is a list of fitbit
+endpoints (``EndpointSpec``), and every endpoint feeds one or more
+BigQuery tables (``TableSpec``).  a table names the json path of its
+rows in the response and either the columns to keep, the dtypes of an
+intraday dataset, or a transform for the few responses that need
+reshaping.
+
+Adding a table is a matter of adding its spec here and its schema to
+``app.fitbit_schemas``; fetching, caching, buffering and loading are
+done once, by the engine, for all tables.
+
+Example::
+
+    spec = SCOPES["body_weight"]
+
+    for endpoint in spec.endpoints:
+        payload = fitbit.get(endpoint.url(date_pulled)).json()
+        for table in endpoint.tables:
+            table.append(tables[table.table], payload, user, date_pulled)
+"""
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .fitbit_transform import normalizer, intraday_columns, profile_dataframe
+from .fitbit_schemas import (
+    ACTIVITY_GOALS_TABLE_SCHEMA,
+    ACTIVITY_LOGS_TABLE_SCHEMA,
+    ACTIVITY_SUMMARY_TABLE_SCHEMA,
+    BADGES_TABLE_SCHEMA,
+    BODY_WEIGHT_TABLE_SCHEMA,
+    DEVICE_TABLE_SCHEMA,
+    HEART_RATE_CUSTOM_ZONES_TABLE_SCHEMA,
+    HEART_RATE_TABLE_SCHEMA,
+    HEART_RATE_ZONES_TABLE_SCHEMA,
+    INTRADAY_CALORIES_TABLE_SCHEMA,
+    INTRADAY_DISTANCES_TABLE_SCHEMA,
+    INTRADAY_ELEVATION_TABLE_SCHEMA,
+    INTRADAY_FLOORS_TABLE_SCHEMA,
+    INTRADAY_STEPS_TABLE_SCHEMA,
+    NUTRITION_GOALS_TABLE_SCHEMA,
+    NUTRITION_LOGS_TABLE_SCHEMA,
+    NUTRITION_SUMMARY_TABLE_SCHEMA,
+    PROFILE_TABLE_SCHEMA,
+    SKINTEMP_TABLE_SCHEMA,
+    SLEEP_SUMMARY_TABLE_SCHEMA,
+    SLEEP_TABLE_SCHEMA,
+    SOCIAL_TABLE_SCHEMA,
+    SPO2_INTRADAY_TABLE_SCHEMA,
+    SPO2_TABLE_SCHEMA,
+)
+from .table_sink import ingest_engine
+
+
+def append_records(table, records, column_list, email, date_pulled):
+    """append the normalized json records of a response to table
+
+    the arrow engine takes the columns straight from the records, the
+    pandas engine goes through ``pd.json_normalize``.
+    """
+
+    if ingest_engine == "arrow":
+        table.append(
+            *normalizer(tuple(column_list)).records(records, email, date_pulled)
+        )
+    else:
+        table.append_frame(
+            normalizer(tuple(column_list))(
+                pd.json_normalize(records), email, date_pulled
+            )
+        )
+
+
+class TableSpec:
+    """Describes a table loaded from the response of a fitbit endpoint.
+
+    * table: name of the BigQuery table.
+    * schema: BigQuery schema of the table, see ``app.fitbit_schemas``.
+    * path: keys (or list indexes) leading to the rows in the response.
+    * columns: json columns to keep, see ``TableNormalizer``.
+    * intraday: for intraday datasets, the dtype of each column to keep,
+        see ``intraday_columns``, with the timestamps in time_column.
+    * transform: callable(records, email, date_pulled) returning the
+        rows as a DataFrame, for responses that need reshaping.
+    * refresh: slow-changing endpoint name; the rows are only loaded if
+        the refresh is due and the records changed since the last one.
+    * pivot: for rows buffered in long form, the key and values pivoted
+        into the wide table when it is loaded, see ``TableBuilder.pivot``.
+    * optional: a response without path has no rows for the table
+        instead of being an error.
+    * key: natural key of the table, the columns identifying a row
+        across pulls.  rows are upserted on it when `INGEST_LOAD_MODE`
+        is `upsert`, see ``app.table_sink``.
+    """
+
+    def __init__(
+        self,
+        table,
+        schema,
+        path=(),
+        columns=(),
+        intraday=None,
+        time_column="date_time",
+        transform=None,
+        refresh=None,
+        pivot=None,
+        optional=False,
+        key=None,
+    ):
+
+        self.table = table
+        self.schema = schema
+        self.path = tuple(path)
+        self.columns = tuple(columns)
+        self.intraday = intraday
+        self.time_column = time_column
+        self.transform = transform
+        self.refresh = refresh
+        self.pivot = pivot
+        self.optional = optional
+        self.key = key
+
+    def records(self, payload):
+        """the rows of the table in a response, KeyError if missing"""
+
+        for key in self.path:
+            try:
+                payload = payload[key]
+            except (KeyError, IndexError, TypeError):
+                if self.optional:
+                    return None
+                raise KeyError(f"{self.table}: no {key} in response")
+
+        return payload
+
+    def append(self, builder, payload, email, date_pulled):
+        """append the rows of the table in a response to builder"""
+
+        records = self.records(payload)
+
+        if records is None:
+            return
+        elif self.intraday:
+            builder.append(
+                *intraday_columns(
+                    records,
+                    self.intraday,
+                    email,
+                    date_pulled,
+                    time_column=self.time_column,
+                )
+            )
+        elif self.transform:
+            builder.append_frame(self.transform(records, email, date_pulled))
+        else:
+            append_records(builder, records, self.columns, email, date_pulled)
+
+
+class EndpointSpec:
+    """Describes a fitbit endpoint and the tables fed by its response.
+
+    * template: url of the endpoint, `{date}` is the date pulled.
+    * tables: ``TableSpec`` of every table found in the response.
+    * refresh: slow-changing endpoint name; the endpoint is only fetched
+        once its refresh is due, see `FITBIT_REFRESH_TTLS`.
+    * empty: callable(payload), True if the response holds no data for
+        the day, which puts the scope in the negative-result cache.
+    * on_response: callable(email, payload) run on every response, for
+        responses that also update the ingestion state.
+
+    the endpoint is identified by ``key``, the template without the date
+    and with runs of non alphanumeric characters replaced by `_`, which
+    is safe as a file or firestore field name.
+    """
+
+    def __init__(
+        self, template, tables, refresh=None, empty=None, on_response=None
+    ):
+
+        self.template = template
+        self.key = re.sub(
+            r"[^0-9A-Za-z]+", "_", template.replace("{date}", "")
+        ).strip("_")
+        self.tables = tables
+        self.refresh = refresh
+        self.empty = empty
+        self.on_response = on_response
+
+    def url(self, date_pulled):
+        return self.template.format(date=date_pulled)
+
+
+class ScopeSpec:
+    """Describes an ingestion scope, the endpoints pulled by one route.
+
+    * name: the scope in the ingestion state, see ``app.ingest_state``.
+    * endpoints: ``EndpointSpec`` of every endpoint of the scope.
+    * tracked: False for scopes that are not recorded as pulled.
+    * device_gated: skip users whose device did not sync since the
+        last pull of the scope.
+    """
+
+    def __init__(self, name, endpoints, tracked=True, device_gated=True):
+
+        self.name = name
+        self.endpoints = endpoints
+        self.tracked = tracked
+        self.device_gated = device_gated
+
+    @property
+    def tables(self):
+        return [table for e in self.endpoints for table in e.tables]
+
+    @property
+    def negative_cache(self):
+        """True if the scope can come back empty"""
+        return any(endpoint.empty for endpoint in self.endpoints)
+
+
+#
+# transforms and hooks
+#
+
+
+def last_sync_time(devices):
+    """latest `lastSyncTime` across a devices.json response"""
+
+    sync_times = [d["lastSyncTime"] for d in devices if d.get("lastSyncTime")]
+    return max(sync_times) if sync_times else None
+
+
+# the hooks only run in the route, the transform workers import this
+# module without the firestore client (see ``app.transform_pool``)
+def _record_devices(email, devices):
+    from .ingest_state import ingest_state
+
+    ingest_state.record_sync(email, last_sync_time(devices))
+
+
+def _record_profile(email, payload):
+    from .ingest_state import ingest_state
+
+    # used to map notifications and schedule by local time
+    ingest_state.update(
+        email,
+        {
+            "encoded_id": payload["user"]["encodedId"],
+            "timezone": payload["user"]["timezone"],
+        },
+    )
+
+
+DEVICE_COLUMNS = ("battery", "batteryLevel", "deviceVersion", "lastSyncTime")
+
+
+def _device_rows(devices, email, date_pulled):
+
+    df = normalizer(DEVICE_COLUMNS)(
+        pd.json_normalize(devices), email, date_pulled
+    )
+    df["last_sync_time"] = df["last_sync_time"].apply(
+        lambda x: datetime.strptime(x, "%Y-%m-%dT%H:%M:%S.%f")
+    )
+    return df
+
+
+SOCIAL_COLUMNS = (
+    "friend_id",
+    "type",
+    "attributes.name",
+    "attributes.friend",
+    "attributes.avatar",
+    "attributes.child",
+)
+
+
+def _social_rows(friends, email, date_pulled):
+
+    df = pd.json_normalize(friends).rename(columns={"id": "friend_id"})
+    return normalizer(SOCIAL_COLUMNS)(df, email, date_pulled)
+
+
+def _profile_rows(profile, email, date_pulled):
+    return profile_dataframe(email, profile)
+
+
+# heart rate zones, kept in long form (one row per zone) until loaded
+HEART_RATE_ZONE_COLUMNS = ("name", "caloriesOut", "minutes", "min", "max")
+
+# wide heart_rate_zones columns: "<zone>_<suffix>", e.g. "peak_min_hr"
+HEART_RATE_ZONE_PIVOT = (
+    "name",
+    {
+        "calories_out": "calories_out",
+        "minutes": "minutes",
+        "min": "min_hr",
+        "max": "max_hr",
+    },
+)
+
+
+ACTIVITY_LOGS_COLUMNS = (
+    "activityId",
+    "activityParentId",
+    "activityParentName",
+    "calories",
+    "description",
+    "distance",
+    "duration",
+    "hasActiveZoneMinutes",
+    "hasStartTime",
+    "isFavorite",
+    "lastModified",
+    "logId",
+    "name",
+    "startDate",
+    "startTime",
+    "steps",
+)
+
+
+def _activity_log_rows(activities, email, date_pulled):
+
+    df = normalizer(ACTIVITY_LOGS_COLUMNS)(
+        pd.json_normalize(activities), email, date_pulled
+    )
+    df["start_datetime"] = pd.to_datetime(
+        df["start_date"] + " " + df["start_time"]
+    )
+    return df.drop(["start_date", "start_time", "last_modified"], axis=1)
+
+
+SLEEP_COLUMNS = (
+    "awakeCount",
+    "awakeDuration",
+    "awakeningsCount",
+    "dateOfSleep",
+    "duration",
+    "efficiency",
+    "endTime",
+    "isMainSleep",
+    "logId",
+    "minutesAfterWakeup",
+    "minutesAsleep",
+    "minutesAwake",
+    "minutesToFallAsleep",
+    "restlessCount",
+    "restlessDuration",
+    "startTime",
+    "timeInBed",
+)
+
+
+def _sleep_rows(sleep, email, date_pulled):
+
+    df = normalizer(SLEEP_COLUMNS)(pd.json_normalize(sleep), email, date_pulled)
+    df["end_time"] = pd.to_datetime(date_pulled + " " + df["end_time"])
+    df["start_time"] = pd.to_datetime(date_pulled + " " + df["start_time"])
+    return df
+
+
+def _intraday(resource, table, schema, dtypes):
+    """spec of the 1min intraday endpoint of an activity resource"""
+
+    return EndpointSpec(
+        "/1/user/-/activities/" + resource + "/date/{date}/1d/1min.json",
+        [
+            TableSpec(
+                table,
+                schema,
+                key=("id", "date_time"),
+                path=("activities-" + resource + "-intraday", "dataset"),
+                intraday=dtypes,
+            )
+        ],
+    )
+
+
+#
+# Scopes
+#
+
+SCOPES = {
+    # Badges, Social, Device and Profile information
+    "chunk_1": ScopeSpec(
+        "chunk_1",
+        [
+            EndpointSpec(
+                "/1/user/-/badges.json",
+                [
+                    TableSpec(
+                        "badges",
+                        BADGES_TABLE_SCHEMA,
+                        key=("id", "date", "badge_type", "value"),
+                        path=("badges",),
+                        columns=(
+                            "badgeGradientEndColor",
+                            "badgeGradientStartColor",
+                            "badgeType",
+                            "category",
+                            "dateTime",
+                            "description",
+                            "earnedMessage",
+                            "encodedId",
+                            "image100px",
+                            "image125px",
+                            "image300px",
+                            "image50px",
+                            "image75px",
+                            "marketingDescription",
+                            "mobileDescription",
+                            "name",
+                            "shareImage640px",
+                            "shareText",
+                            "shortDescription",
+                            "shortName",
+                            "timesAchieved",
+                            "value",
+                            "unit",
+                        ),
+                        refresh="badges",
+                    )
+                ],
+                refresh="badges",
+            ),
+            EndpointSpec(
+                "1/user/-/devices.json",
+                [
+                    TableSpec(
+                        "device",
+                        DEVICE_TABLE_SCHEMA,
+                        key=("id", "date", "device_version"),
+                        transform=_device_rows,
+                        refresh="device",
+                    )
+                ],
+                refresh="device",
+                on_response=_record_devices,
+            ),
+            EndpointSpec(
+                "1.1/user/-/friends.json",
+                [
+                    TableSpec(
+                        "social",
+                        SOCIAL_TABLE_SCHEMA,
+                        key=("id", "date", "friend_id"),
+                        path=("data",),
+                        transform=_social_rows,
+                        refresh="social",
+                    )
+                ],
+                refresh="social",
+            ),
+            EndpointSpec(
+                "/1/user/-/profile.json",
+                [
+                    TableSpec(
+                        "profile",
+                        PROFILE_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("user",),
+                        transform=_profile_rows,
+                        refresh="profile",
+                    )
+                ],
+                refresh="profile",
+                on_response=_record_profile,
+            ),
+        ],
+        tracked=False,
+        device_gated=False,
+    ),
+    "body_weight": ScopeSpec(
+        "body_weight",
+        [
+            EndpointSpec(
+                "/1/user/-/body/log/weight/date/{date}.json",
+                [
+                    TableSpec(
+                        "body_weight",
+                        BODY_WEIGHT_TABLE_SCHEMA,
+                        key=("id", "log_id"),
+                        path=("weight",),
+                        columns=("bmi", "fat", "logId", "source", "weight"),
+                    )
+                ],
+                empty=lambda payload: not payload["weight"],
+            )
+        ],
+        device_gated=False,
+    ),
+    "nutrition": ScopeSpec(
+        "nutrition",
+        [
+            EndpointSpec(
+                "/1/user/-/foods/log/goal.json",
+                [
+                    TableSpec(
+                        "nutrition_goals",
+                        NUTRITION_GOALS_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("goals",),
+                        columns=("calories",),
+                        refresh="nutrition_goals",
+                    )
+                ],
+                refresh="nutrition_goals",
+            ),
+            EndpointSpec(
+                "/1/user/-/foods/log/date/{date}.json",
+                [
+                    TableSpec(
+                        "nutrition_summary",
+                        NUTRITION_SUMMARY_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("summary",),
+                        columns=(
+                            "calories",
+                            "carbs",
+                            "fat",
+                            "fiber",
+                            "protein",
+                            "sodium",
+                            "water",
+                        ),
+                    ),
+                    TableSpec(
+                        "nutrition_logs",
+                        NUTRITION_LOGS_TABLE_SCHEMA,
+                        key=("id", "log_id"),
+                        path=("foods",),
+                        columns=(
+                            "isFavorite",
+                            "logDate",
+                            "logId",
+                            "loggedFood.accessLevel",
+                            "loggedFood.amount",
+                            "loggedFood.brand",
+                            "loggedFood.calories",
+                            "loggedFood.foodId",
+                            "loggedFood.mealTypeId",
+                            "loggedFood.name",
+                            "loggedFood.unit.name",
+                            "loggedFood.unit.plural",
+                            "nutritionalValues.calories",
+                            "nutritionalValues.carbs",
+                            "nutritionalValues.fat",
+                            "nutritionalValues.fiber",
+                            "nutritionalValues.protein",
+                            "nutritionalValues.sodium",
+                            "loggedFood.locale",
+                        ),
+                    ),
+                ],
+                # users who never log food get an all-zero summary
+                empty=lambda payload: not payload["foods"]
+                and not any(payload["summary"].values()),
+            ),
+        ],
+        device_gated=False,
+    ),
+    "heart_rate": ScopeSpec(
+        "heart_rate",
+        [
+            EndpointSpec(
+                "1/user/-/activities/heart/date/{date}/1d.json",
+                [
+                    TableSpec(
+                        "heart_rate_zones",
+                        HEART_RATE_ZONES_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("activities-heart", 0, "value", "heartRateZones"),
+                        columns=HEART_RATE_ZONE_COLUMNS,
+                        pivot=HEART_RATE_ZONE_PIVOT,
+                    ),
+                    # user defined zones, any name and number of them
+                    TableSpec(
+                        "heart_rate_custom_zones",
+                        HEART_RATE_CUSTOM_ZONES_TABLE_SCHEMA,
+                        key=("id", "date", "name"),
+                        path=(
+                            "activities-heart",
+                            0,
+                            "value",
+                            "customHeartRateZones",
+                        ),
+                        columns=HEART_RATE_ZONE_COLUMNS,
+                        optional=True,
+                    ),
+                    # only returned to apps with intraday access
+                    TableSpec(
+                        "heart_rate",
+                        HEART_RATE_TABLE_SCHEMA,
+                        key=("id", "datetime"),
+                        path=("activities-heart-intraday", "dataset"),
+                        intraday={"value": np.int16},
+                        time_column="datetime",
+                        optional=True,
+                    ),
+                ],
+            )
+        ],
+    ),
+    "activity": ScopeSpec(
+        "activity",
+        [
+            EndpointSpec(
+                "/1/user/-/activities/date/{date}.json",
+                [
+                    TableSpec(
+                        "activity_logs",
+                        ACTIVITY_LOGS_TABLE_SCHEMA,
+                        key=("id", "log_id"),
+                        path=("activities",),
+                        transform=_activity_log_rows,
+                    ),
+                    TableSpec(
+                        "activity_summary",
+                        ACTIVITY_SUMMARY_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("summary",),
+                        columns=(
+                            "activeScore",
+                            "activityCalories",
+                            "caloriesBMR",
+                            "caloriesOut",
+                            "elevation",
+                            "fairlyActiveMinutes",
+                            "floors",
+                            "lightlyActiveMinutes",
+                            "marginalCalories",
+                            "restingHeartRate",
+                            "sedentaryMinutes",
+                            "steps",
+                            "veryActiveMinutes",
+                        ),
+                    ),
+                    TableSpec(
+                        "activity_goals",
+                        ACTIVITY_GOALS_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("goals",),
+                        columns=(
+                            "activeMinutes",
+                            "caloriesOut",
+                            "distance",
+                            "floors",
+                            "steps",
+                        ),
+                        refresh="activity_goals",
+                    ),
+                ],
+            )
+        ],
+    ),
+    "intraday": ScopeSpec(
+        "intraday",
+        [
+            _intraday(
+                "steps",
+                "intraday_steps",
+                INTRADAY_STEPS_TABLE_SCHEMA,
+                {"value": np.int16},
+            ),
+            _intraday(
+                "calories",
+                "intraday_calories",
+                INTRADAY_CALORIES_TABLE_SCHEMA,
+                {"level": np.int8, "mets": np.int16, "value": np.float32},
+            ),
+            _intraday(
+                "distance",
+                "intraday_distances",
+                INTRADAY_DISTANCES_TABLE_SCHEMA,
+                {"value": np.float32},
+            ),
+            _intraday(
+                "elevation",
+                "intraday_elevation",
+                INTRADAY_ELEVATION_TABLE_SCHEMA,
+                {"value": np.float32},
+            ),
+            # the BigQuery column is FLOAT
+            _intraday(
+                "floors",
+                "intraday_floors",
+                INTRADAY_FLOORS_TABLE_SCHEMA,
+                {"value": np.float32},
+            ),
+        ],
+    ),
+    "sleep": ScopeSpec(
+        "sleep",
+        [
+            EndpointSpec(
+                "/1/user/-/sleep/date/{date}.json",
+                [
+                    TableSpec(
+                        "sleep",
+                        SLEEP_TABLE_SCHEMA,
+                        key=("id", "log_id"),
+                        path=("sleep",),
+                        transform=_sleep_rows,
+                    ),
+                    TableSpec(
+                        "sleep_summary",
+                        SLEEP_SUMMARY_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("summary",),
+                        columns=(
+                            "totalMinutesAsleep",
+                            "totalSleepRecords",
+                            "totalTimeInBed",
+                            "stages.deep",
+                            "stages.light",
+                            "stages.rem",
+                            "stages.wake",
+                        ),
+                    ),
+                ],
+            )
+        ],
+    ),
+    "spo2": ScopeSpec(
+        "spo2",
+        [
+            EndpointSpec(
+                "/1/user/-/spo2/date/{date}.json",
+                [
+                    TableSpec(
+                        "spo2",
+                        SPO2_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("value",),
+                        columns=("avg", "min", "max"),
+                    )
+                ],
+                empty=lambda payload: not payload.get("value"),
+            )
+        ],
+    ),
+    "spo2_intraday": ScopeSpec(
+        "spo2_intraday",
+        [
+            EndpointSpec(
+                "/1/user/-/spo2/date/{date}/all.json",
+                [
+                    TableSpec(
+                        "spo2_intraday",
+                        SPO2_INTRADAY_TABLE_SCHEMA,
+                        key=("id", "minute"),
+                        path=("minutes",),
+                        columns=("value", "minute"),
+                    )
+                ],
+                empty=lambda payload: not payload.get("minutes"),
+            )
+        ],
+    ),
+    "temp": ScopeSpec(
+        "temp",
+        [
+            EndpointSpec(
+                "/1/user/-/temp/skin/date/{date}.json",
+                [
+                    TableSpec(
+                        "skintemp",
+                        SKINTEMP_TABLE_SCHEMA,
+                        key=("id", "date"),
+                        path=("tempSkin",),
+                        columns=(
+                            "dateTime",
+                            "logType",
+                            "value.nightlyRelative",
+                        ),
+                    )
+                ],
+                empty=lambda payload: not payload["tempSkin"],
+            )
+        ],
+    ),
+}
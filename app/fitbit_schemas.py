@@ -0,0 +1,1195 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""BigQuery schemas of the tables loaded by the ingestion routes.
+
+one ``<TABLE>_TABLE_SCHEMA`` list per table, the fields in the format
+of the BigQuery api (see ``SchemaField.from_api_repr``).
+"""
+
+
+BADGES_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {"name": "badge_gradient_end_color", "type": "STRING"},
+    {"name": "badge_gradient_start_color", "type": "STRING"},
+    {
+        "name": "badge_type",
+        "type": "STRING",
+        "description": "Type of badge received.",
+    },
+    {"name": "category", "type": "STRING"},
+    {
+        "name": "date_time",
+        "type": "STRING",
+        "description": "Date the badge was achieved.",
+    },
+    {"name": "description", "type": "STRING"},
+    {"name": "earned_message", "type": "STRING"},
+    {"name": "encoded_id", "type": "STRING"},
+    {"name": "image_100px", "type": "STRING"},
+    {"name": "image_125px", "type": "STRING"},
+    {"name": "image_300px", "type": "STRING"},
+    {"name": "image_50px", "type": "STRING"},
+    {"name": "image_75px", "type": "STRING"},
+    {"name": "marketing_description", "type": "STRING"},
+    {"name": "mobile_description", "type": "STRING"},
+    {"name": "name", "type": "STRING"},
+    {"name": "share_image_640px", "type": "STRING"},
+    {"name": "share_text", "type": "STRING"},
+    {"name": "short_description", "type": "STRING"},
+    {"name": "short_name", "type": "STRING"},
+    {
+        "name": "times_achieved",
+        "type": "INTEGER",
+        "description": "Number of times the user has achieved the badge.",
+    },
+    {
+        "name": "value",
+        "type": "INTEGER",
+        "description": "Units of meaure based on localization settings.",
+    },
+    {
+        "name": "unit",
+        "type": "STRING",
+        "description": "The badge goal in the unit measurement.",
+    },
+]
+
+
+DEVICE_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "battery",
+        "type": "STRING",
+        "description": "Returns the battery level of the device. Supported: High | Medium | Low | Empty",
+    },
+    {
+        "name": "battery_level",
+        "type": "INTEGER",
+        "description": "Returns the battery level percentage of the device.",
+    },
+    {
+        "name": "device_version",
+        "type": "STRING",
+        "description": "The product name of the device.",
+    },
+    {
+        "name": "last_sync_time",
+        "type": "TIMESTAMP",
+        "description": "Timestamp representing the last time the device was sync'd with the Fitbit mobile application.",
+    },
+]
+
+
+SOCIAL_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "friend_id",
+        "type": "STRING",
+        "description": "Fitbit user id",
+    },
+    {
+        "name": "type",
+        "type": "STRING",
+        "description": "Fitbit user id",
+    },
+    {
+        "name": "attributes_name",
+        "type": "STRING",
+        "description": "Person's display name.",
+    },
+    {
+        "name": "attributes_friend",
+        "type": "BOOLEAN",
+        "description": "The product name of the device.",
+    },
+    {
+        "name": "attributes_avatar",
+        "type": "STRING",
+        "description": "Link to user's avatar picture.",
+    },
+    {
+        "name": "attributes_child",
+        "type": "BOOLEAN",
+        "description": "Boolean value describing friend as a child account.",
+    },
+]
+
+
+BODY_WEIGHT_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "bmi",
+        "type": "FLOAT",
+        "description": "Calculated BMI in the format X.XX",
+    },
+    {
+        "name": "fat",
+        "type": "FLOAT",
+        "description": "The body fat percentage.",
+    },
+    {
+        "name": "log_id",
+        "type": "INTEGER",
+        "description": "Weight Log IDs are unique to the user, but not globally unique.",
+    },
+    {
+        "name": "source",
+        "type": "STRING",
+        "description": "The source of the weight log.",
+    },
+    {
+        "name": "weight",
+        "type": "FLOAT",
+        "description": "Weight in the format X.XX,",
+    },
+]
+
+
+NUTRITION_SUMMARY_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "calories",
+        "type": "FLOAT",
+        "description": "Total calories consumed.",
+    },
+    {
+        "name": "carbs",
+        "type": "FLOAT",
+        "description": "Total carbs consumed.",
+    },
+    {
+        "name": "fat",
+        "type": "FLOAT",
+        "description": "Total fats consumed.",
+    },
+    {
+        "name": "fiber",
+        "type": "FLOAT",
+        "description": "Total fibers cosnsumed.",
+    },
+    {
+        "name": "protein",
+        "type": "FLOAT",
+        "description": "Total proteins consumed.",
+    },
+    {
+        "name": "sodium",
+        "type": "FLOAT",
+        "description": "Total sodium consumed.",
+    },
+    {
+        "name": "water",
+        "type": "FLOAT",
+        "description": "Total water consumed",
+    },
+]
+
+
+NUTRITION_LOGS_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "is_favorite",
+        "type": "BOOLEAN",
+        "mode": "NULLABLE",
+        "description": "Total calories consumed.",
+    },
+    {
+        "name": "log_date",
+        "type": "DATE",
+        "mode": "NULLABLE",
+        "description": "Date of the food log.",
+    },
+    {
+        "name": "log_id",
+        "type": "INTEGER",
+        "mode": "NULLABLE",
+        "description": "Food log id.",
+    },
+    {
+        "name": "logged_food_access_level",
+        "type": "STRING",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_amount",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_brand",
+        "type": "STRING",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_calories",
+        "type": "INTEGER",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_food_id",
+        "type": "INTEGER",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_meal_type_id",
+        "type": "INTEGER",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_name",
+        "type": "STRING",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_unit_name",
+        "type": "STRING",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_unit_plural",
+        "type": "STRING",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "nutritional_values_calories",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "nutritional_values_carbs",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "nutritional_values_fat",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "nutritional_values_fiber",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "nutritional_values_protein",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "nutritional_values_sodium",
+        "type": "FLOAT",
+        "mode": "NULLABLE",
+    },
+    {
+        "name": "logged_food_locale",
+        "type": "STRING",
+        "mode": "NULLABLE",
+    },
+]
+
+
+NUTRITION_GOALS_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "calories",
+        "type": "INTEGER",
+        "description": "The users set calorie goal",
+    },
+]
+
+
+HEART_RATE_CUSTOM_ZONES_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "name",
+        "type": "STRING",
+        "description": "Name of the user defined heart rate zone.",
+    },
+    {
+        "name": "calories_out",
+        "type": "FLOAT",
+        "description": "Number calories burned within the zone.",
+    },
+    {
+        "name": "minutes",
+        "type": "INTEGER",
+        "description": "Number of minutes spent within the zone.",
+    },
+    {
+        "name": "min",
+        "type": "INTEGER",
+        "description": "Minimum heart rate of the zone.",
+    },
+    {
+        "name": "max",
+        "type": "INTEGER",
+        "description": "Maximum heart rate of the zone.",
+    },
+]
+
+
+HEART_RATE_ZONES_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "out_of_range_calories_out",
+        "type": "FLOAT",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "out_of_range_minutes",
+        "type": "INTEGER",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "out_of_range_min_hr",
+        "type": "INTEGER",
+        "description": "Minimum range for the heart rate zone.",
+    },
+    {
+        "name": "out_of_range_max_hr",
+        "type": "INTEGER",
+        "description": "Maximum range for the heart rate zone.",
+    },
+    {
+        "name": "fat_burn_calories_out",
+        "type": "FLOAT",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "fat_burn_minutes",
+        "type": "INTEGER",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "fat_burn_min_hr",
+        "type": "INTEGER",
+        "description": "Minimum range for the heart rate zone.",
+    },
+    {
+        "name": "fat_burn_max_hr",
+        "type": "INTEGER",
+        "description": "Maximum range for the heart rate zone.",
+    },
+    {
+        "name": "cardio_calories_out",
+        "type": "FLOAT",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "cardio_minutes",
+        "type": "INTEGER",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "cardio_min_hr",
+        "type": "INTEGER",
+        "description": "Minimum range for the heart rate zone.",
+    },
+    {
+        "name": "cardio_max_hr",
+        "type": "INTEGER",
+        "description": "Maximum range for the heart rate zone.",
+    },
+    {
+        "name": "peak_calories_out",
+        "type": "FLOAT",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "peak_minutes",
+        "type": "INTEGER",
+        "description": "Number calories burned with the specified heart rate zone.",
+    },
+    {
+        "name": "peak_min_hr",
+        "type": "INTEGER",
+        "description": "Minimum range for the heart rate zone.",
+    },
+    {
+        "name": "peak_max_hr",
+        "type": "INTEGER",
+        "description": "Maximum range for the heart rate zone.",
+    },
+]
+
+
+HEART_RATE_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "datetime",
+        "type": "TIMESTAMP",
+    },
+    {
+        "name": "value",
+        "type": "INTEGER",
+    },
+    {"name": "date_time", "type": "TIMESTAMP"},
+]
+
+
+ACTIVITY_LOGS_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "activity_id",
+        "type": "INTEGER",
+        "description": "The ID of the activity.",
+    },
+    {
+        "name": "activity_parent_id",
+        "type": "INTEGER",
+        "description": 'The ID of the top level ("parent") activity.',
+    },
+    {
+        "name": "activity_parent_name",
+        "type": "STRING",
+        "description": 'The name of the top level ("parent") activity.',
+    },
+    {
+        "name": "calories",
+        "type": "INTEGER",
+        "description": "Number of calories burned during the exercise.",
+    },
+    {
+        "name": "description",
+        "type": "STRING",
+        "description": "The description of the recorded exercise.",
+    },
+    {
+        "name": "distance",
+        "type": "FLOAT",
+        "description": "The distance traveled during the recorded exercise.",
+    },
+    {
+        "name": "duration",
+        "type": "INTEGER",
+        "description": "The activeDuration (milliseconds) + any pauses that occurred during the activity recording.",
+    },
+    {
+        "name": "has_active_zone_minutes",
+        "type": "BOOLEAN",
+        "description": "True | False",
+    },
+    {
+        "name": "has_start_time",
+        "type": "BOOLEAN",
+        "description": "True | False",
+    },
+    {
+        "name": "is_favorite",
+        "type": "BOOLEAN",
+        "description": "True | False",
+    },
+    # {'name': 'last_modified', 'type': 'TIMESTAMP', 'description':'Timestamp the exercise was last modified.'},
+    {
+        "name": "log_id",
+        "type": "INTEGER",
+        "description": "The activity log identifier for the exercise.",
+    },
+    {
+        "name": "name",
+        "type": "STRING",
+        "description": "Name of the recorded exercise.",
+    },
+    {
+        "name": "start_datetime",
+        "type": "TIMESTAMP",
+        "description": "The start time of the recorded exercise.",
+    },
+    {
+        "name": "steps",
+        "type": "INTEGER",
+        "description": "User defined goal for daily step count.",
+    },
+]
+
+
+ACTIVITY_SUMMARY_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "active_score",
+        "type": "INTEGER",
+        "description": "No Description",
+    },
+    {
+        "name": "activity_calories",
+        "type": "INTEGER",
+        "description": "The number of calories burned for the day during periods the user was active above sedentary level. This includes both activity burned calories and BMR.",
+    },
+    {
+        "name": "calories_bmr",
+        "type": "INTEGER",
+        "description": "Total BMR calories burned for the day.",
+    },
+    {
+        "name": "calories_out",
+        "type": "INTEGER",
+        "description": "Total calories burned for the day (daily timeseries total).",
+    },
+    {
+        "name": "elevation",
+        "type": "INTEGER",
+        "description": "The elevation traveled for the day.",
+    },
+    {
+        "name": "fairly_active_minutes",
+        "type": "INTEGER",
+        "description": "Total minutes the user was fairly/moderately active.",
+    },
+    {
+        "name": "floors",
+        "type": "INTEGER",
+        "description": "The equivalent floors climbed for the day.",
+    },
+    {
+        "name": "lightly_active_minutes",
+        "type": "INTEGER",
+        "description": "	Total minutes the user was lightly active.",
+    },
+    {
+        "name": "marginal_calories",
+        "type": "INTEGER",
+        "description": "Total marginal estimated calories burned for the day.",
+    },
+    {
+        "name": "resting_heart_rate",
+        "type": "INTEGER",
+        "description": "The resting heart rate for the day",
+    },
+    {
+        "name": "sedentary_minutes",
+        "type": "INTEGER",
+        "description": "Total minutes the user was sedentary.",
+    },
+    {
+        "name": "very_active_minutes",
+        "type": "INTEGER",
+        "description": "Total minutes the user was very active.",
+    },
+    {
+        "name": "steps",
+        "type": "INTEGER",
+        "description": "Total steps taken for the day.",
+    },
+]
+
+
+ACTIVITY_GOALS_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "active_minutes",
+        "type": "INTEGER",
+        "description": "User defined goal for daily active minutes.",
+    },
+    {
+        "name": "calories_out",
+        "type": "INTEGER",
+        "description": "User defined goal for daily calories burned.",
+    },
+    {
+        "name": "distance",
+        "type": "FLOAT",
+        "description": "User defined goal for daily distance traveled.",
+    },
+    {
+        "name": "floors",
+        "type": "INTEGER",
+        "description": "User defined goal for daily floor count.",
+    },
+    {
+        "name": "steps",
+        "type": "INTEGER",
+        "description": "User defined goal for daily step count.",
+    },
+]
+
+
+INTRADAY_STEPS_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "value",
+        "type": "INTEGER",
+        "description": "Number of steps at this time",
+    },
+    {
+        "name": "date_time",
+        "type": "TIMESTAMP",
+        "description": "Time of day",
+    },
+]
+
+
+INTRADAY_CALORIES_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {"name": "level", "type": "INTEGER"},
+    {
+        "name": "mets",
+        "type": "INTEGER",
+        "description": "METs value at the moment when the resource was recorded.",
+    },
+    {
+        "name": "value",
+        "type": "FLOAT",
+        "description": "The specified resource's value at the time it is recorded.",
+    },
+    {
+        "name": "date_time",
+        "type": "TIMESTAMP",
+        "description": "Time of day",
+    },
+]
+
+
+INTRADAY_DISTANCES_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "value",
+        "type": "FLOAT",
+        "description": "The specified resource's value at the time it is recorded.",
+    },
+    {
+        "name": "date_time",
+        "type": "TIMESTAMP",
+        "description": "Time of day",
+    },
+]
+
+
+INTRADAY_ELEVATION_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "value",
+        "type": "FLOAT",
+        "description": "The specified resource's value at the time it is recorded.",
+    },
+    {
+        "name": "date_time",
+        "type": "TIMESTAMP",
+        "description": "Time of day",
+    },
+]
+
+
+INTRADAY_FLOORS_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "value",
+        "type": "FLOAT",
+        "description": "The specified resource's value at the time it is recorded.",
+    },
+    {
+        "name": "date_time",
+        "type": "TIMESTAMP",
+        "description": "Time of day",
+    },
+]
+
+
+SLEEP_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "awake_count",
+        "type": "INTEGER",
+        "description": "Number of times woken up",
+    },
+    {
+        "name": "awake_duration",
+        "type": "INTEGER",
+        "description": "Amount of time the user was awake",
+    },
+    {
+        "name": "awakenings_count",
+        "type": "INTEGER",
+        "description": "Number of times woken up",
+    },
+    {
+        "name": "date_of_sleep",
+        "type": "DATE",
+        "description": "The date the user fell asleep",
+    },
+    {
+        "name": "duration",
+        "type": "INTEGER",
+        "description": "Length of the sleep in milliseconds.",
+    },
+    {
+        "name": "efficiency",
+        "type": "INTEGER",
+        "description": "Calculated sleep efficiency score. This is not the sleep score available in the mobile application.",
+    },
+    {
+        "name": "end_time",
+        "type": "TIMESTAMP",
+        "description": "Time the sleep log ended.",
+    },
+    {
+        "name": "is_main_sleep",
+        "type": "BOOLEAN",
+        "description": "True | False",
+    },
+    {
+        "name": "log_id",
+        "type": "INTEGER",
+        "description": "Sleep log ID.",
+    },
+    {
+        "name": "minutes_after_wakeup",
+        "type": "INTEGER",
+        "description": "The total number of minutes after the user woke up.",
+    },
+    {
+        "name": "minutes_asleep",
+        "type": "INTEGER",
+        "description": "The total number of minutes the user was asleep.",
+    },
+    {
+        "name": "minutes_awake",
+        "type": "INTEGER",
+        "description": "The total number of minutes the user was awake.",
+    },
+    {
+        "name": "minutes_to_fall_asleep",
+        "type": "INTEGER",
+        "description": "The total number of minutes before the user falls asleep. This value is generally 0 for autosleep created sleep logs.",
+    },
+    {
+        "name": "restless_count",
+        "type": "INTEGER",
+        "description": "The total number of times the user was restless",
+    },
+    {
+        "name": "restless_duration",
+        "type": "INTEGER",
+        "description": "The total amount of time the user was restless",
+    },
+    {
+        "name": "start_time",
+        "type": "TIMESTAMP",
+        "description": "Time the sleep log begins.",
+    },
+    {
+        "name": "time_in_bed",
+        "type": "INTEGER",
+        "description": "Total number of minutes the user was in bed.",
+    },
+]
+
+
+SLEEP_SUMMARY_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "total_minutes_asleep",
+        "type": "INTEGER",
+        "description": "Total number of minutes the user was asleep across all sleep records in the sleep log.",
+    },
+    {
+        "name": "total_sleep_records",
+        "type": "INTEGER",
+        "description": "The number of sleep records within the sleep log.",
+    },
+    {
+        "name": "total_time_in_bed",
+        "type": "INTEGER",
+        "description": "Total number of minutes the user was in bed across all records in the sleep log.",
+    },
+    {
+        "name": "stages_deep",
+        "type": "INTEGER",
+        "description": "Total time of deep sleep",
+    },
+    {
+        "name": "stages_light",
+        "type": "INTEGER",
+        "description": "Total time of light sleep",
+    },
+    {
+        "name": "stages_rem",
+        "type": "INTEGER",
+        "description": "Total time of REM sleep",
+    },
+    {
+        "name": "stages_wake",
+        "type": "INTEGER",
+        "description": "Total time awake",
+    },
+]
+
+
+SPO2_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "avg",
+        "type": "FLOAT",
+        "description": "The mean of the 1 minute SpO2 levels calculated as a percentage value.",
+    },
+    {
+        "name": "min",
+        "type": "FLOAT",
+        "description": "The minimum daily SpO2 level calculated as a percentage value.",
+    },
+    {
+        "name": "max",
+        "type": "FLOAT",
+        "description": "The maximum daily SpO2 level calculated as a percentage value.",
+    },
+]
+
+
+SPO2_INTRADAY_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "value",
+        "type": "FLOAT",
+        "description": "The percentage value of SpO2 calculated at a specific date and time in a single day.",
+    },
+    {
+        "name": "minute",
+        "type": "DATETIME",
+        "description": "The date and time at which the SpO2 measurement was taken.",
+    },
+]
+
+
+SKINTEMP_TABLE_SCHEMA = [
+    {
+        "name": "id",
+        "type": "STRING",
+        "mode": "REQUIRED",
+        "description": "Primary Key",
+    },
+    {
+        "name": "date",
+        "type": "DATE",
+        "mode": "REQUIRED",
+        "description": "The date values were extracted",
+    },
+    {
+        "name": "date_time",
+        "type": "DATE",
+        "description": "the date of the measurements",
+    },
+    {
+        "name": "log_type",
+        "type": "STRING",
+        "description": "The type of skin temperature log created",
+    },
+    {
+        "name": "value_nightly_relative",
+        "type": "FLOAT",
+        "description": "The user's average temperature during a period of sleep.",
+    },
+]
+
+
+PROFILE_TABLE_SCHEMA = [
+    {"name": "id", "type": "STRING", "description": "Primary Key"},
+    {
+        "name": "date",
+        "type": "DATE",
+        "description": "Date of authorization",
+    },
+    {
+        "name": "age",
+        "type": "INTEGER",
+        "description": "The age based on their specified birthday in the user's account settings.",
+    },
+    {
+        "name": "city",
+        "type": "STRING",
+        "description": "The city specified in the user's account settings. Location scope is required to see this value.",
+    },
+    {
+        "name": "state",
+        "type": "STRING",
+        "description": "The state specified in the user's account settings. Location scope is required to see this value. ",
+    },
+    {
+        "name": "country",
+        "type": "STRING",
+        "description": "The country specified in the user's account settings. Location scope is required to see this value.",
+    },
+    {
+        "name": "date_of_birth",
+        "type": "DATE",
+        "description": "The birthday date specified in the user's account settings.",
+    },
+    {
+        "name": "display_name",
+        "type": "STRING",
+        "description": "The name shown when the user's friends look at their Fitbit profile, send a message, or other interactions within the Friends section of the Fitbit app or fitbit.com dashboard, such as challenges.",
+    },
+    {
+        "name": "encoded_id",
+        "type": "STRING",
+        "description": "The encoded ID of the user. Use '-' (dash) for current logged-in user.",
+    },
+    {
+        "name": "full_name",
+        "type": "STRING",
+        "description": "The full name value specified in the user's account settings.",
+    },
+    {
+        "name": "gender",
+        "type": "STRING",
+        "description": "The user's specified gender.",
+    },
+    {
+        "name": "height",
+        "type": "FLOAT",
+        "description": "The height value specified in the user's account settings.",
+    },
+    {
+        "name": "height_unit",
+        "type": "STRING",
+        "description": "The unit system defined in the user's account settings. See Localization.",
+    },
+    {
+        "name": "timezone",
+        "type": "STRING",
+        "description": "The timezone defined in the user's account settings.",
+    },
+    {"name": "surgery_date", "type": "DATE"},
+]
@@ -0,0 +1,569 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Classes and functions for transforming fitbit responses into tables.
+
+Module provides the helpers used by the ingestion routes to turn the
+json returned by the fitbit web apis into rows of the BigQuery tables.
+Currently this includes ``TableNormalizer``, which selects, orders and
+renames the columns of a response, ``intraday_columns``, which turns
+an intraday dataset straight into typed numpy columns, and
+``TableBuilder``, which accumulates the rows of a table for the whole
+cohort in growable columns instead of one DataFrame per user.
+
+Tables can also be built as pyarrow Tables (``TableBuilder.to_arrow``)
+with the types of the BigQuery schema, from columns taken straight out
+of the json records (``TableNormalizer.records``), skipping pandas.
+
+The work that only depends on a table's column list, or on the date
+being pulled (the minute grid of intraday timestamps), is done once and
+cached, so the per-user cost is a single DataFrame construction.
+
+Tables are kept compact: ids and dates are dictionary-encoded, intraday
+values use the smallest numpy dtype that holds them (e.g. int16 steps,
+float32 distances) and timestamps are native datetime64 columns.
+
+Example::
+
+    weight_table = TableBuilder()
+
+    for user in users:
+        df = pd.json_normalize(resp.json()["weight"])
+        df = normalizer(("bmi", "fat", "logId"))(df, user, date_pulled)
+        weight_table.append_frame(df)
+
+    # columns: ["id", "date", "bmi", "fat", "log_id"]
+    bulk_df = weight_table.to_frame()
+"""
+import functools
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from skimpy import clean_columns
+
+log = logging.getLogger(__name__)
+
+# BigQuery column types and the arrow types loaded into them
+ARROW_TYPES = {
+    "STRING": pa.string(),
+    "INTEGER": pa.int64(),
+    "FLOAT": pa.float64(),
+    "BOOLEAN": pa.bool_(),
+    "DATE": pa.date32(),
+    "DATETIME": pa.timestamp("us"),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+}
+
+
+class TableNormalizer:
+    """Normalizes responses into rows with a fixed list of columns.
+
+    compiled once per column list: the snake_case column names (as
+    produced by skimpy's ``clean_columns``) and the column order are
+    computed up front.  columns missing from a response are filled with
+    None, columns not in the list are dropped, and `id` and `date`
+    columns are added in front.
+    """
+
+    def __init__(self, columns):
+
+        self.columns = list(columns)
+        self.names = list(
+            clean_columns(pd.DataFrame(columns=["id", "date"] + self.columns))
+        )
+        # json paths of the columns, as flattened by pd.json_normalize
+        self.paths = [column.split(".") for column in self.columns]
+
+    def __call__(self, df, email, date_pulled):
+
+        data = {self.names[0]: email, self.names[1]: date_pulled}
+        for name, column in zip(self.names[2:], self.columns):
+            data[name] = df[column] if column in df.columns else None
+
+        return pd.DataFrame(data, index=df.index)
+
+    def records(self, records, email, date_pulled):
+        """columns straight from a list of json records
+
+        the same columns as a normalized ``pd.json_normalize(records)``,
+        without building a DataFrame.  returns the columns and the number
+        of rows, as taken by ``TableBuilder.append``.
+        """
+
+        if isinstance(records, dict):
+            records = [records]
+
+        data = {self.names[0]: email, self.names[1]: date_pulled}
+        for name, path in zip(self.names[2:], self.paths):
+            values = np.empty(len(records), dtype=object)
+            for i, record in enumerate(records):
+                values[i] = _lookup(record, path)
+            data[name] = values
+
+        return data, len(records)
+
+
+def _lookup(record, path):
+    """value at path in a json record, None if missing"""
+
+    for key in path:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+
+    return record
+
+
+@functools.lru_cache(maxsize=None)
+def normalizer(columns):
+    """return the compiled ``TableNormalizer`` for a tuple of columns"""
+
+    return TableNormalizer(columns)
+
+
+def _normalize_profile(df, column_list, user_email):
+    date_pulled = date.today().strftime("%Y-%m-%d")
+    for col in column_list:
+        if col not in df.columns:
+            df[col] = None
+        df = df.reindex(columns=column_list)
+    df.insert(0, "id", user_email)
+    df.insert(1, "date", date_pulled)
+    df.insert(14, "surgery_date", date_pulled)
+    df = clean_columns(df)
+
+    return df
+
+
+def profile_dataframe(id, profile):
+    """normalize a fitbit profile into a row of the profile table"""
+
+    profile_df = pd.json_normalize(profile)
+    profile_columns = [
+        "age",
+        "city",
+        "state",
+        "country",
+        "dateOfBirth",
+        "displayName",
+        "encodedId",
+        "fullName",
+        "gender",
+        "height",
+        "heightUnit",
+        "timezone",
+    ]
+    return _normalize_profile(profile_df, profile_columns, id)
+
+
+@functools.lru_cache(maxsize=64)
+def minute_grid(date_pulled):
+    """read-only array with the timestamp of every minute of date_pulled"""
+
+    start = np.datetime64(date_pulled, "ns")
+    grid = start + np.arange(0, 24 * 60, dtype="timedelta64[m]")
+    grid.flags.writeable = False
+    return grid
+
+
+def seconds_of_day(times):
+    """seconds since midnight for a list of "HH:MM:SS" strings"""
+
+    digits = np.frombuffer("".join(times).encode(), dtype=np.uint8)
+    digits = digits.reshape(-1, 8).astype(np.int32) - ord("0")
+
+    return (
+        (digits[:, 0] * 10 + digits[:, 1]) * 3600
+        + (digits[:, 3] * 10 + digits[:, 4]) * 60
+        + (digits[:, 6] * 10 + digits[:, 7])
+    )
+
+
+def intraday_timestamps(date_pulled, times):
+    """timestamps for the "HH:MM:SS" times of an intraday dataset
+
+    a complete 1min dataset is the cached grid itself, other minute
+    resolution datasets index into it.  finer resolutions (e.g. 1sec
+    heart rate) are offset from the start of the day.
+    """
+
+    grid = minute_grid(date_pulled)
+    if (
+        len(times) == len(grid)
+        and times[0] == "00:00:00"
+        and times[-1] == "23:59:00"
+    ):
+        return grid
+
+    seconds = seconds_of_day(times)
+    if not (seconds % 60).any():
+        return grid[seconds // 60]
+
+    return grid[0] + seconds.astype("timedelta64[s]")
+
+
+def intraday_columns(
+    dataset, columns, email, date_pulled, time_column="date_time"
+):
+    """columns for the dataset of an intraday response
+
+    dataset is the list of ``{"time": "HH:MM:SS", "value": ...}`` points;
+    columns maps each key to keep, in order, to its numpy dtype.  returns
+    the columns (`id`, `date`, the columns, and the timestamps of the
+    points in time_column) and the number of rows, as taken by
+    ``TableBuilder.append``.
+    """
+
+    count = len(dataset)
+
+    data = {"id": email, "date": date_pulled}
+    for column, dtype in columns.items():
+        data[column] = np.fromiter(
+            (point[column] for point in dataset), dtype=dtype, count=count
+        )
+    data[time_column] = intraday_timestamps(
+        date_pulled, [point["time"] for point in dataset]
+    )
+
+    return data, count
+
+
+def _common_dtype(dtype, other):
+    """dtype able to hold values of both dtypes, object as a last resort"""
+
+    if dtype == other:
+        return dtype
+
+    if dtype.kind == "O" or other.kind == "O":
+        return np.dtype(object)
+
+    try:
+        return np.result_type(dtype, other)
+    except TypeError:
+        return np.dtype(object)
+
+
+def _cast(values, dtype):
+    """values as dtype, keeping timestamps as timestamps in object arrays"""
+
+    if dtype.kind == "O" and values.dtype.kind == "M":
+        return values.astype("datetime64[us]").astype(object)
+
+    return values.astype(dtype)
+
+
+class _Column:
+    """numpy array that grows by doubling its capacity"""
+
+    def __init__(self, dtype, capacity):
+
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values, count):
+
+        end = self.size + count
+
+        dtype = _common_dtype(self.data.dtype, values.dtype)
+        if dtype != self.data.dtype:
+            self.data = _cast(self.data, dtype)
+        if dtype != values.dtype:
+            values = _cast(values, dtype)
+
+        if end > len(self.data):
+            grown = np.empty(max(end, 2 * len(self.data)), dtype=dtype)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+
+        self.data[self.size : end] = values
+        self.size = end
+
+    def extend_missing(self, count):
+        """append count missing values (NaN, NaT or None)"""
+
+        kind = self.data.dtype.kind
+        if kind == "M":
+            missing = np.datetime64("NaT", "ns")
+        elif kind in "iuf":
+            missing = np.nan
+        else:
+            missing = None
+
+        self.extend(np.asarray(missing), count)
+
+    @property
+    def nbytes(self):
+        return self.size * self.data.itemsize
+
+    def array(self):
+        return self.data[: self.size]
+
+    def arrow(self, type):
+        values = self.array()
+        if values.dtype.kind == "O":
+            try:
+                array = pa.array(values, from_pandas=True)
+            except (pa.ArrowException):
+                # mixed types, let the cast parse their text
+                array = pa.array(
+                    [None if v is None else str(v) for v in values]
+                )
+        else:
+            # NaN and NaT are missing values, as they are in pandas
+            array = pa.array(values, from_pandas=True)
+
+        return array.cast(type)
+
+
+class _CategoryColumn:
+    """dictionary-encoded column: int32 codes into a list of categories"""
+
+    def __init__(self, capacity):
+
+        self.codes = _Column(np.int32, capacity)
+        self.categories = []
+        self.index = {}
+
+    def _code(self, value):
+
+        if value is None or value != value:
+            return -1
+
+        if value not in self.index:
+            self.index[value] = len(self.categories)
+            self.categories.append(value)
+        return self.index[value]
+
+    def extend(self, values, count):
+
+        if values.ndim == 0:
+            codes = np.asarray(self._code(values.item()), dtype=np.int32)
+        else:
+            codes, uniques = pd.factorize(values)
+            lookup = np.array(
+                [self._code(value) for value in uniques] + [-1], dtype=np.int32
+            )
+            codes = lookup[codes]
+
+        self.codes.extend(codes, count)
+
+    def extend_missing(self, count):
+        self.codes.extend(np.asarray(-1, dtype=np.int32), count)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def arrow(self, type):
+        codes = self.codes.array()
+        dictionary = pa.array(self.categories, from_pandas=True).cast(type)
+        return dictionary.take(pa.array(codes, mask=codes < 0))
+
+    def array(self):
+        return pd.Categorical.from_codes(
+            self.codes.array(), categories=self.categories
+        )
+
+
+class TableBuilder:
+    """Accumulates the rows of a table column by column.
+
+    Examples of use::
+
+        steps_table = TableBuilder()
+
+        steps_table.append(
+            {"id": user, "date": date_pulled, "value": values}, len(values)
+        )
+        ...
+        if len(steps_table) > 0:
+            bulk_steps_df = steps_table.to_frame()
+
+    values are either arrays with one value per row or scalars, which
+    are repeated for every row.  each column is a numpy array grown by
+    doubling, so appending costs no intermediate DataFrames and the
+    final table is built without copying everything again.  columns
+    missing from an append are filled with NaN, NaT or None, as with
+    ``pd.concat``.
+
+    the columns named in categorical (by default `id` and `date`, which
+    repeat the same few strings on every row) are dictionary-encoded and
+    returned as ``pd.Categorical``: 4 bytes per row instead of a
+    reference to a python string.
+    """
+
+    def __init__(self, categorical=("id", "date")):
+
+        self.categorical = set(categorical)
+        self.columns = {}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def nbytes(self):
+        """approximate size of the rows, object columns count references"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def clear(self):
+        """drop all rows appended so far"""
+
+        self.columns = {}
+        self.rows = 0
+
+    def append(self, columns, count):
+        """append count rows, given as a dict of column name to values"""
+
+        for name, values in columns.items():
+
+            values = np.asarray(values)
+            if values.dtype.kind in "US":
+                values = values.astype(object)
+
+            if name not in self.columns:
+                capacity = max(count, 1024)
+                if name in self.categorical:
+                    self.columns[name] = _CategoryColumn(capacity)
+                else:
+                    self.columns[name] = _Column(values.dtype, capacity)
+                if self.rows:
+                    self.columns[name].extend_missing(self.rows)
+
+            self.columns[name].extend(values, count)
+
+        for name in self.columns.keys() - columns.keys():
+            self.columns[name].extend_missing(count)
+
+        self.rows += count
+
+    def append_frame(self, df):
+        """append the rows of a DataFrame"""
+
+        self.append({name: df[name].to_numpy() for name in df.columns}, len(df))
+
+    def append_arrow(self, table):
+        """append the rows of a pyarrow Table
+
+        numeric columns without nulls are appended straight from the
+        arrow buffers, without building a DataFrame.
+        """
+
+        columns = {}
+        for name, column in zip(table.column_names, table.columns):
+            if pa.types.is_dictionary(column.type):
+                column = column.cast(column.type.value_type)
+            columns[name] = column.to_numpy()
+
+        self.append(columns, table.num_rows)
+
+    def to_frame(self):
+        """DataFrame with all rows appended so far"""
+
+        return pd.DataFrame(
+            {name: column.array() for name, column in self.columns.items()}
+        )
+
+    def pivot(self, key, values, index=("id", "date")):
+        """TableBuilder with the long-form rows pivoted to wide columns
+
+        the rows hold one entry per key for each index (e.g. one row per
+        heart rate zone and user-day).  the result has one row per
+        distinct index, and a column ``<key>_<suffix>`` for each key and
+        each long column in values (a dict of long column to suffix),
+        with the key snake_cased: "Fat Burn" -> "fat_burn_minutes".
+
+        index and key must be categorical columns; the pivot is a single
+        scatter per output column, whatever the number of rows.
+        """
+
+        wide = TableBuilder(categorical=self.categorical)
+        if not self.rows or key not in self.columns:
+            return wide
+
+        # one group code per distinct index
+        group = np.zeros(self.rows, dtype=np.int64)
+        for name in index:
+            column = self.columns[name]
+            group = group * (len(column.categories) + 1) + (
+                column.codes.array() + 1
+            )
+        _, first, inverse = np.unique(
+            group, return_index=True, return_inverse=True
+        )
+        count = len(first)
+
+        data = {name: self.columns[name].array()[first] for name in index}
+
+        keys = self.columns[key]
+        key_codes = keys.codes.array()
+        for code, name in enumerate(keys.categories):
+            mask = key_codes == code
+            rows = inverse[mask]
+            prefix = str(name).replace(" ", "_").lower()
+
+            complete = len(np.unique(rows)) == count
+            for column, suffix in values.items():
+                long = self.columns[column].array()
+                if complete:
+                    wide_values = np.empty(count, dtype=long.dtype)
+                elif long.dtype.kind == "O":
+                    wide_values = np.full(count, None, dtype=object)
+                else:
+                    wide_values = np.full(
+                        count,
+                        np.nan,
+                        dtype=np.result_type(long.dtype, np.float32),
+                    )
+                wide_values[rows] = long[mask]
+                data[prefix + "_" + suffix] = wide_values
+
+        wide.append(data, count)
+        return wide
+
+    def to_arrow(self, schema):
+        """pyarrow Table with all rows appended so far
+
+        the table has exactly the fields of schema (see ``arrow_schema``):
+        columns are cast to the field types and missing columns are
+        null. Columns not in the schema are left out and logged, as
+        they are not loaded.
+        """
+
+        dropped = sorted(set(self.columns) - set(schema.names))
+        if dropped:
+            log.error("columns not in the schema, dropped: %s", dropped)
+
+        arrays = []
+        for field in schema:
+            if field.name in self.columns:
+                arrays.append(self.columns[field.name].arrow(field.type))
+            else:
+                arrays.append(pa.nulls(self.rows, field.type))
+
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def arrow_schema(table_schema):
+    """arrow schema for a BigQuery table schema (a list of fields)"""
+
+    return pa.schema(
+        [
+            pa.field(field["name"], ARROW_TYPES[field["type"]])
+            for field in table_schema
+        ]
+    )
@@ -0,0 +1,398 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Classes and functions for tracking per-user ingestion state.
+
+Module provides the ``IngestState`` class, a small firestore document
+kept for every enrolled user that lets the ingestion routes avoid
+fitbit api calls that are known to be unproductive.
+
+Currently this includes a negative-result cache: scopes that returned
+no data for a user (most users never log weight, food, ...) are only
+re-probed after an exponentially growing number of days (1, 2, 4, ...).
+The entry is cleared as soon as the scope returns data again, or when
+a fitbit subscription notification arrives for the matching collection.
+
+The date each scope was last pulled, along with pending notifications,
+also decides the order users are ingested in, stalest first, so a run
+cut short does not keep starving the same users.
+
+It also caches the `lastSyncTime` of the user's devices along with the
+sync time seen when each scope was last pulled, so scopes can be
+skipped when the device has not uploaded anything new.
+
+Slow-changing endpoints (badges, friends, goals, ...) are refreshed on
+a per-endpoint ttl; the hash of the last payload loaded is kept so
+unchanged data is not loaded again.
+
+Every other response loaded is hashed too, per endpoint and date, so
+that re-pulling recent dates (to catch late device uploads) skips the
+transform and load of the responses that did not change.  the hashes
+are kept for `CONTENT_HASH_DAYS` days.
+
+Configuration:
+
+    * `INGEST_STATE_DATASET`: optional, name of the firestore collection
+        used to store ingestion state.  defaults to `ingest_state`.
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from firebase_admin import firestore
+
+from .firestore_storage import db
+
+
+log = logging.getLogger(__name__)
+
+# longest interval between two probes of a scope known to be empty
+MAX_REPROBE_DAYS = 32
+
+# days the content hashes of the loaded responses are kept for
+CONTENT_HASH_DAYS = 14
+
+# fitbit subscription collection types and the ingest scopes they affect
+SUBSCRIPTION_SCOPES = {
+    "activities": ["activity", "intraday", "heart_rate"],
+    "body": ["body_weight"],
+    "foods": ["nutrition"],
+    "sleep": ["sleep", "spo2", "spo2_intraday", "temp"],
+}
+
+
+def content_hash(payload):
+    """sha256 of the canonical json encoding of payload"""
+
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def _merge(target, fields):
+    """merge nested fields into target, honoring firestore.DELETE_FIELD"""
+    for key, value in fields.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            _merge(target.setdefault(key, {}), value)
+        else:
+            target[key] = value
+
+
+class IngestState:
+    """Firestore backend for per-user ingestion state.
+
+    Examples of use::
+
+        ingest_state = IngestState("ingest_state")
+
+        ingest_state.load_all(users)
+        if ingest_state.should_probe(user, "body_weight", date_pulled):
+            ...
+            if not data:
+                ingest_state.record_empty(user, "body_weight", date_pulled)
+            else:
+                ingest_state.record_data(user, "body_weight")
+
+    each user has one document, keyed by the user's email (same key
+    as the token storage).  ``load`` (or ``load_all``) refreshes the
+    local copy and should be called at the start of each ingest run.
+    """
+
+    def __init__(self, collection):
+
+        self.collection = db.collection(collection)
+        self._cache = {}
+
+    def load(self, user):
+        """read the state document for user from firestore"""
+
+        doc = self.collection.document(user).get()
+        self._cache[user] = dict(doc.to_dict()) if doc.exists else {}
+        return self._cache[user]
+
+    def load_all(self, users):
+        """read the state documents for users in a single batch"""
+
+        refs = [self.collection.document(user) for user in users]
+        for doc in db.get_all(refs):
+            self._cache[doc.id] = dict(doc.to_dict()) if doc.exists else {}
+
+    def get(self, user):
+        """return the locally cached state for user, loading if needed"""
+
+        if user not in self._cache:
+            return self.load(user)
+        return self._cache[user]
+
+    def update(self, user, fields):
+        """merge (possibly nested) fields into the state for user"""
+
+        self.collection.document(user).set(fields, merge=True)
+        _merge(self.get(user), fields)
+
+    def find_user(self, encoded_id):
+        """return the user whose fitbit encoded id matches, or None"""
+
+        for doc in (
+            self.collection.where("encoded_id", "==", encoded_id)
+            .limit(1)
+            .stream()
+        ):
+            return doc.id
+
+        return None
+
+    #
+    # negative-result cache
+    #
+
+    def should_probe(self, user, scope, date_pulled):
+        """False if scope is known to be empty and not yet due a re-probe"""
+
+        entry = self.get(user).get("empty", {}).get(scope)
+        return not entry or date_pulled >= entry["next_probe"]
+
+    def record_empty(self, user, scope, date_pulled):
+        """scope returned no data, push the next probe further out"""
+
+        entry = self.get(user).get("empty", {}).get(scope, {})
+        misses = entry.get("misses", 0) + 1
+        interval = min(2 ** (misses - 1), MAX_REPROBE_DAYS)
+        next_probe = datetime.strptime(date_pulled, "%Y-%m-%d") + timedelta(
+            days=interval
+        )
+
+        log.debug(
+            "%s: %s empty %d times, next probe in %d days",
+            user,
+            scope,
+            misses,
+            interval,
+        )
+
+        self.update(
+            user,
+            {
+                "empty": {
+                    scope: {
+                        "misses": misses,
+                        "next_probe": next_probe.strftime("%Y-%m-%d"),
+                    }
+                }
+            },
+        )
+
+        # no data is still a successful pull
+        self.record_pull(user, scope, date_pulled)
+
+    def record_data(self, user, scope):
+        """scope returned data, drop it from the negative cache"""
+
+        self.clear_empty(user, [scope])
+
+    def clear_empty(self, user, scopes):
+        """drop scopes from the negative cache for user"""
+
+        cached = self.get(user).get("empty", {})
+        scopes = [scope for scope in scopes if scope in cached]
+
+        if scopes:
+            self.update(
+                user,
+                {"empty": {scope: firestore.DELETE_FIELD for scope in scopes}},
+            )
+
+    #
+    # device sync tracking
+    #
+
+    def record_sync(self, user, last_sync_time):
+        """cache the latest `lastSyncTime` across the user's devices"""
+
+        self.update(
+            user,
+            {
+                "last_sync_time": last_sync_time,
+                "sync_checked_at": datetime.utcnow().isoformat(),
+            },
+        )
+
+    def sync_checked_within(self, user, seconds):
+        """True if the cached sync time is younger than seconds"""
+
+        checked_at = self.get(user).get("sync_checked_at")
+        if not checked_at:
+            return False
+
+        age = datetime.utcnow() - datetime.fromisoformat(checked_at)
+        return age.total_seconds() < seconds
+
+    def record_pull(self, user, scope, date_pulled):
+        """scope was pulled for date_pulled with the current sync time"""
+
+        state = self.get(user)
+        pulled = state.get("pulled", {}).get(scope, {})
+
+        # backfills of older dates do not count towards freshness
+        if pulled.get("date", "") > date_pulled:
+            return
+
+        self.update(
+            user,
+            {
+                "pulled": {
+                    scope: {
+                        "date": date_pulled,
+                        "sync": state.get("last_sync_time"),
+                    }
+                },
+                "pending": {scope: firestore.DELETE_FIELD},
+            },
+        )
+
+    def device_idle(self, user, scope, date_pulled):
+        """True if the device has not synced anything new for scope
+
+        either the device has not synced since before date_pulled began,
+        or date_pulled was already pulled and no sync happened since.
+        both `lastSyncTime` and date_pulled are in the user's local time.
+        a pending subscription notification always counts as new data.
+        """
+
+        state = self.get(user)
+        last_sync = state.get("last_sync_time")
+        if not last_sync or scope in state.get("pending", {}):
+            return False
+
+        if last_sync < date_pulled:
+            return True
+
+        pulled = state.get("pulled", {}).get(scope, {})
+        return pulled.get("date") == date_pulled and (
+            pulled.get("sync") == last_sync
+        )
+
+    #
+    # subscription notifications and priorities
+    #
+
+    def record_notification(self, user, collection_type, notified_date):
+        """a subscription notification arrived for user
+
+        marks the matching scopes as pending and drops them from the
+        negative cache, so the next run probes them first.
+        """
+
+        scopes = SUBSCRIPTION_SCOPES.get(collection_type, [])
+        if not scopes:
+            return
+
+        self.clear_empty(user, scopes)
+        self.update(
+            user, {"pending": {scope: notified_date for scope in scopes}}
+        )
+
+    def priority(self, user, scope, date_pulled):
+        """sort key for the ingest order of scope, larger goes first
+
+        the days since the last successful pull of scope (scopes never
+        ingested for the user count as infinitely stale), with pending
+        subscription notifications breaking ties.
+        """
+
+        state = self.get(user)
+        pending = scope in state.get("pending", {})
+        pulled = state.get("pulled", {}).get(scope)
+        if not pulled:
+            return (float("inf"), pending)
+
+        stale = datetime.strptime(date_pulled, "%Y-%m-%d") - datetime.strptime(
+            pulled["date"], "%Y-%m-%d"
+        )
+        return (stale.days, pending)
+
+    #
+    # slow-changing endpoints
+    #
+
+    def refresh_due(self, user, endpoint, date_pulled, ttl_days):
+        """True if endpoint was not refreshed in the last ttl_days"""
+
+        refreshed = self.get(user).get("refreshed", {}).get(endpoint)
+        if not refreshed:
+            return True
+
+        due = datetime.strptime(refreshed["date"], "%Y-%m-%d") + timedelta(
+            days=ttl_days
+        )
+        return date_pulled >= due.strftime("%Y-%m-%d")
+
+    def refresh_changed(self, user, endpoint, payload_hash):
+        """True if payload_hash differs from the last refresh loaded"""
+
+        refreshed = self.get(user).get("refreshed", {}).get(endpoint, {})
+        return refreshed.get("hash") != payload_hash
+
+    def record_refresh(self, user, endpoint, date_pulled, payload_hash):
+        """endpoint was refreshed and its payload, if changed, loaded"""
+
+        self.update(
+            user,
+            {
+                "refreshed": {
+                    endpoint: {"date": date_pulled, "hash": payload_hash}
+                }
+            },
+        )
+
+    #
+    # content hashes
+    #
+
+    def content_unchanged(self, user, endpoint, date_pulled, payload_hash):
+        """True if the response loaded for endpoint matches payload_hash
+
+        endpoint is the ``EndpointSpec.key`` of the response.
+        """
+
+        content = self.get(user).get("content", {})
+        return content.get(date_pulled, {}).get(endpoint) == payload_hash
+
+    def record_content(self, user, date_pulled, hashes):
+        """remember the hashes of the responses loaded for date_pulled
+
+        hashes maps endpoint keys to payload hashes.  the hashes of dates
+        older than `CONTENT_HASH_DAYS` are dropped.
+        """
+
+        cutoff = datetime.strptime(date_pulled, "%Y-%m-%d") - timedelta(
+            days=CONTENT_HASH_DAYS
+        )
+        expired = {
+            date: firestore.DELETE_FIELD
+            for date in self.get(user).get("content", {})
+            if date < cutoff.strftime("%Y-%m-%d")
+        }
+
+        self.update(user, {"content": {date_pulled: hashes, **expired}})
+
+
+ingest_state_datasetname = os.environ.get("INGEST_STATE_DATASET")
+if not ingest_state_datasetname:
+    ingest_state_datasetname = "ingest_state"
+ingest_state = IngestState(ingest_state_datasetname)
@@ -0,0 +1,168 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Archive of the raw fitbit api responses.
+
+Module provides the ``ResponseArchive`` class.  when enabled, the
+ingestion routes keep every response they fetch, so that a table can
+be rebuilt after a transform bug or a schema change without pulling
+the data from fitbit again (the api is rate limited, and old intraday
+data cannot be pulled in bulk).
+
+the archive is append-only: each ingestion run writes its own gzip
+compressed json lines files, one per endpoint and date::
+
+    <path>/<endpoint key>/date=<date>/<run>.jsonl.gz
+
+with one record per user and successful response (error bodies are
+not archived).  files are never rewritten, when a user-day was pulled
+more than once the latest response wins.
+
+the scope routes replay the archive instead of calling the api when
+given the `replay` query param, see ``app.fitbit_ingest``.
+
+Configuration:
+
+    * `INGEST_ARCHIVE_PATH`: optional, directory or object store uri
+        (e.g. `gs://bucket/archive`) the responses are archived to.
+        responses are not archived when not set.
+"""
+import os
+import json
+import zlib
+import uuid
+import logging
+from datetime import datetime
+
+from pyarrow import fs
+
+
+log = logging.getLogger(__name__)
+
+# where responses are archived, None to not archive them
+archive_path = os.environ.get("INGEST_ARCHIVE_PATH") or None
+
+
+class ResponseArchive:
+    """Append-only archive of the responses of an ingestion run.
+
+    Examples of use::
+
+        archive = ResponseArchive("gs://bucket/archive")
+
+        payload = fitbit.get(endpoint.url(date_pulled)).json()
+        archive.record(endpoint.key, user, date_pulled, payload)
+        ...
+        archive.close()
+
+        # later, without calling the api
+        payload = archive.payload(endpoint.key, user, date_pulled)
+
+    each instance writes its own files, create one per run and close it
+    once the run is done.  ``payload`` reads all the files of an
+    endpoint and date the first time it is called for them and keeps
+    the responses compressed in memory.
+    """
+
+    def __init__(self, path=None):
+
+        path = path or archive_path
+        if "://" not in path:
+            path = os.path.abspath(path)
+
+        self.filesystem, self.path = fs.FileSystem.from_uri(path)
+        self.run = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self._streams = {}
+        self._loaded = {}
+
+    def _dir(self, endpoint, date_pulled):
+        return f"{self.path}/{endpoint}/date={date_pulled}"
+
+    #
+    # archiving
+    #
+
+    def record(self, endpoint, user, date_pulled, payload):
+        """append the response of endpoint (its key) for a user-day"""
+
+        directory = self._dir(endpoint, date_pulled)
+
+        if directory not in self._streams:
+            self.filesystem.create_dir(directory)
+            self._streams[directory] = self.filesystem.open_output_stream(
+                f"{directory}/{self.run}.jsonl.gz", compression="gzip"
+            )
+
+        record = {
+            "user": user,
+            "date": date_pulled,
+            "fetched_at": datetime.utcnow().isoformat(),
+            "payload": payload,
+        }
+        self._streams[directory].write((json.dumps(record) + "\n").encode())
+
+    def close(self):
+        """finish the files written by this run"""
+
+        for stream in self._streams.values():
+            try:
+                stream.close()
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
+        self._streams = {}
+
+    #
+    # replay
+    #
+
+    def payload(self, endpoint, user, date_pulled):
+        """the latest archived response for a user-day, None if missing"""
+
+        directory = self._dir(endpoint, date_pulled)
+        if directory not in self._loaded:
+            self._loaded[directory] = self._load(directory)
+
+        line = self._loaded[directory].get(user)
+        if line is None:
+            return None
+        return json.loads(zlib.decompress(line[1]))["payload"]
+
+    def _load(self, directory):
+
+        latest = {}
+
+        files = self.filesystem.get_file_info(
+            fs.FileSelector(directory, allow_not_found=True)
+        )
+        for info in files:
+
+            if not info.path.endswith(".jsonl.gz"):
+                continue
+
+            with self.filesystem.open_input_stream(
+                info.path, compression="gzip"
+            ) as stream:
+                for line in stream.read().splitlines():
+                    record = json.loads(line)
+                    user = record["user"]
+                    if user not in latest or (
+                        latest[user][0] < record["fetched_at"]
+                    ):
+                        latest[user] = (
+                            record["fetched_at"],
+                            zlib.compress(line),
+                        )
+
+        log.debug("%s: %d archived responses", directory, len(latest))
+        return latest
@@ -0,0 +1,866 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Classes for writing ingested tables to their destination.
+
+Module provides ``BigQuerySink``, which loads DataFrames or pyarrow
+Tables into the BigQuery tables of the fitbit dataset with parquet load
+jobs, and
+``BufferedTable``, a ``TableBuilder`` that hands its rows to a sink
+whenever the buffer grows past a row or byte threshold.  the ingestion
+routes append rows as users are processed, so peak memory depends on
+the thresholds and not on the size of the cohort.
+
+Every load writes the rows to parquet with the exact types of the
+table's BigQuery schema and submits a single load job, rather than
+going through pandas_gbq (which checks the table and compares schemas
+on every call).  tables are created once, partitioned by day on their
+`date` column and clustered by `id`, so per-user and per-date queries
+only scan the matching partitions and blocks; see ``create_table``.
+with the arrow engine buffers are converted to pyarrow Tables straight
+away, without building a DataFrame first.
+
+with `INGEST_LOAD_MODE=upsert`, tables that have a natural key (see
+``TableSpec``) are loaded into a staging table and merged into the
+table on that key instead of appended: reruns and retries replace the
+rows they pulled before instead of duplicating them.
+
+``BigQueryStreamSink`` has the same interface and appends the rows with
+the BigQuery Storage Write API instead, so they can be queried seconds
+after a pull rather than once a load job ran, and without using the
+load job quota.  rows are sent as arrow record batches at explicit
+offsets, which makes retried appends exactly-once.
+
+``DuckDBSink`` keeps the tables in a local DuckDB database file instead,
+to run small studies on a single machine or to benchmark and test the
+ingestion without a gcp project.
+
+with `INGEST_LAKE_PATH` set, every write is also exported by
+``ParquetLakeSink`` to a hive-partitioned parquet lake on local disk or
+object storage, which notebooks can scan with predicate pushdown rather
+than exporting tables from the warehouse.
+
+every sink has the same interface: ``write(table, data, schema, key)``
+appends rows (or upserts them on key) and ``create_table(table,
+schema)`` creates a table up front.  `INGEST_SINK` picks the sink of
+the ingestion routes, see ``make_sink``.
+
+``Uploader`` wraps a sink and performs its writes from background
+threads, so a route keeps fetching and transforming while full buffers
+are loaded, and the tables flushed at the end of a route load side by
+side: the load phase takes as long as the slowest table rather than
+the sum of all of them.  up to `INGEST_UPLOAD_WORKERS` tables are loaded
+at once and `INGEST_UPLOAD_QUEUE` more wait in a queue, beyond that a
+write waits for an upload to finish.
+
+Example::
+
+    steps_table = BufferedTable("intraday_steps", INTRADAY_STEPS_TABLE_SCHEMA)
+
+    for user in users:
+        steps_table.append(*intraday_columns(dataset, columns, user, date))
+
+    # loads whatever is still buffered
+    steps_table.flush()
+
+Configuration:
+
+    * `GOOGLE_CLOUD_PROJECT`: gcp project where bigquery is available.
+    * `BIGQUERY_DATASET`: dataset to use to store user data.
+    * `INGEST_FLUSH_ROWS`: optional, rows buffered per table before they
+        are written out.  defaults to 1000000.
+    * `INGEST_FLUSH_MB`: optional, approximate size in megabytes of the
+        buffer of a table before it is written out.  defaults to 128.
+    * `INGEST_SPILL_DIR`: optional, when set full buffers are spilled to
+        parquet files in this directory and only loaded when the table is
+        flushed at the end of the route.
+    * `INGEST_ENGINE`: optional, `pandas` (the default) transforms the
+        json responses with pandas, `arrow` builds pyarrow Tables straight
+        from the json responses.
+    * `INGEST_UPLOAD_WORKERS`: optional, tables an ``Uploader`` loads
+        concurrently.  defaults to 4.
+    * `INGEST_UPLOAD_QUEUE`: optional, tables waiting on the background
+        uploads of an ``Uploader``.  defaults to 1.
+    * `INGEST_LOAD_MODE`: optional, `append` (the default) appends rows,
+        `upsert` merges them into the tables on their natural key.
+    * `INGEST_SINK`: optional, `bigquery` (the default) loads tables with
+        load jobs, `bigquery_stream` with the Storage Write API, `duckdb`
+        writes them to a local DuckDB database.
+    * `INGEST_STREAM_TYPE`: optional, write stream of `bigquery_stream`.
+        `pending` (the default) commits each write at once when all its
+        rows are appended, `committed` makes rows visible as they are
+        appended.
+    * `INGEST_DUCKDB_PATH`: optional, database file of the `duckdb` sink.
+        defaults to `fitbit.duckdb`.
+    * `INGEST_LAKE_PATH`: optional, directory or object store uri (e.g.
+        `gs://bucket/lake`) the tables are also exported to as parquet.
+    * `INGEST_LAKE_BUCKETS`: optional, number of user hash buckets the
+        lake is partitioned by.  defaults to 16.
+"""
+import io
+import os
+import uuid
+import zlib
+import queue
+import logging
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow.compute as pc
+from pyarrow import fs
+from google.cloud import bigquery
+from google.cloud import bigquery_storage_v1
+from google.cloud.bigquery_storage_v1 import types, writer
+
+from .fitbit_transform import TableBuilder, arrow_schema
+
+
+log = logging.getLogger(__name__)
+
+bigquery_datasetname = os.environ.get("BIGQUERY_DATASET")
+if not bigquery_datasetname:
+    bigquery_datasetname = "fitbit2"
+
+# buffer thresholds of a BufferedTable
+flush_rows = int(os.environ.get("INGEST_FLUSH_ROWS", 1000000))
+flush_bytes = int(os.environ.get("INGEST_FLUSH_MB", 128)) * 1024 * 1024
+
+# directory full buffers are spilled to, None to write them out directly
+spill_dir = os.environ.get("INGEST_SPILL_DIR") or None
+
+# "pandas" or "arrow", how responses are turned into tables and loaded
+ingest_engine = os.environ.get("INGEST_ENGINE", "pandas")
+
+# concurrent uploads, and tables queued for upload before a write blocks
+upload_workers = int(os.environ.get("INGEST_UPLOAD_WORKERS", 4))
+upload_queue = int(os.environ.get("INGEST_UPLOAD_QUEUE", 1))
+
+# "append" or "upsert", how rows with a natural key are written
+load_mode = os.environ.get("INGEST_LOAD_MODE", "append")
+
+# "bigquery", "bigquery_stream" or "duckdb", where the routes write to
+ingest_sink = os.environ.get("INGEST_SINK", "bigquery")
+
+# database file of DuckDBSink
+duckdb_path = os.environ.get("INGEST_DUCKDB_PATH", "fitbit.duckdb")
+
+# parquet lake the tables are also exported to, None for no export
+lake_path = os.environ.get("INGEST_LAKE_PATH") or None
+lake_buckets = int(os.environ.get("INGEST_LAKE_BUCKETS", 16))
+
+# "pending" or "committed", the write streams of BigQueryStreamSink
+stream_type = os.environ.get("INGEST_STREAM_TYPE", "pending")
+
+# the Storage Write API takes requests of up to 10MB
+MAX_APPEND_BYTES = 8 * 1024 * 1024
+
+# DuckDB column types of the BigQuery types
+DUCKDB_TYPES = {
+    "STRING": "VARCHAR",
+    "INTEGER": "BIGINT",
+    "FLOAT": "DOUBLE",
+    "BOOLEAN": "BOOLEAN",
+    "DATE": "DATE",
+    "DATETIME": "TIMESTAMP",
+    "TIMESTAMP": "TIMESTAMPTZ",
+}
+
+
+def _tablename(table: str) -> str:
+    return bigquery_datasetname + "." + table
+
+
+def _as_arrow(data, schema):
+    """pyarrow Table of data with the types of the BigQuery schema"""
+
+    if isinstance(data, pd.DataFrame):
+        builder = TableBuilder(categorical=())
+        builder.append_frame(data)
+        data = builder.to_arrow(arrow_schema(schema))
+
+    return data
+
+
+class BigQuerySink:
+    """Appends rows to the BigQuery tables of the fitbit dataset.
+
+    DataFrames are first converted to pyarrow Tables with the types of
+    the schema.  the table is written to parquet in memory and loaded
+    with a BigQuery load job.  the first write to a table creates it
+    (see ``create_table``), later loads skip the schema.
+
+    given a key (a tuple of column names), the rows are upserted: they
+    are loaded into a staging table, which is merged into the table on
+    the key and dropped.  rows matching an existing key replace it, and
+    of the rows sharing a key in one write only one is kept.  the
+    MERGEs into a table run one at a time, across the sinks of the
+    process: concurrent MERGEs into the same partitions fail with
+    serialization conflicts.
+    """
+
+    # lock of each table MERGEs are run into, shared by all sinks
+    _merge_locks = {}
+    _merge_locks_lock = threading.Lock()
+
+    def __init__(self, project_id=None):
+
+        self.project_id = project_id or os.environ.get("GOOGLE_CLOUD_PROJECT")
+        self._client = None
+        self._created = set()
+
+    def _merge_lock(self, table):
+
+        with self._merge_locks_lock:
+            return self._merge_locks.setdefault(table, threading.Lock())
+
+    @property
+    def client(self):
+
+        if self._client is None:
+            self._client = bigquery.Client(project=self.project_id)
+        return self._client
+
+    def write(self, table, data, schema, key=None):
+        """append the rows of data to table, created with schema if needed
+
+        with key, upsert the rows on the key columns instead.
+        """
+
+        arrow_table = _as_arrow(data, schema)
+
+        if key:
+            self._upsert(table, arrow_table, schema, key)
+            return
+
+        self.create_table(table, schema)
+        self._load_parquet(table, arrow_table, schema)
+
+    def create_table(self, table, schema):
+        """create table with schema unless it exists
+
+        the table is partitioned by day on its `date` column, the local
+        day of the user the rows were pulled for, and clustered by `id`.
+        existing tables are left as they are, partitioning an existing
+        table means recreating it.  each table is only checked once per
+        sink.
+        """
+
+        if table in self._created:
+            return
+
+        bq_table = bigquery.Table(
+            f"{self.client.project}.{_tablename(table)}",
+            schema=[bigquery.SchemaField.from_api_repr(f) for f in schema],
+        )
+        names = [field["name"] for field in schema]
+        if "date" in names:
+            bq_table.time_partitioning = bigquery.TimePartitioning(
+                type_=bigquery.TimePartitioningType.DAY, field="date"
+            )
+        if "id" in names:
+            bq_table.clustering_fields = ["id"]
+
+        self.client.create_table(bq_table, exists_ok=True)
+        self._created.add(table)
+
+    def _load_parquet(
+        self,
+        table,
+        arrow_table,
+        schema,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    ):
+
+        # the parquet fields are all nullable, the schema keeps the
+        # REQUIRED mode of the table's columns
+        buffer = io.BytesIO()
+        pq.write_table(arrow_table, buffer)
+        buffer.seek(0)
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=write_disposition,
+            schema=[bigquery.SchemaField.from_api_repr(f) for f in schema],
+        )
+        self.client.load_table_from_file(
+            buffer, _tablename(table), job_config=job_config
+        ).result()
+
+    def _upsert(self, table, arrow_table, schema, key):
+
+        if not arrow_table.num_rows:
+            return
+
+        self.create_table(table, schema)
+
+        # the staging table is created by the load job, with schema
+        staging = f"{table}_staging_{uuid.uuid4().hex}"
+        self._load_parquet(
+            staging,
+            arrow_table,
+            schema,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        )
+
+        dates = None
+        if "date" in arrow_table.column_names:
+            dates = pc.unique(arrow_table.column("date")).to_pylist()
+
+        try:
+            with self._merge_lock(table):
+                self.client.query(
+                    _merge_sql(table, staging, schema, key, dates)
+                ).result()
+        finally:
+            self.client.delete_table(
+                f"{self.client.project}.{_tablename(staging)}",
+                not_found_ok=True,
+            )
+
+
+def _merge_sql(table, staging, schema, key, dates=None):
+    """MERGE of the rows of staging into table on the key columns
+
+    staging rows sharing a key are reduced to one, a MERGE fails when
+    more than one source row matches a target row.  dates are the
+    `date` partitions of the staged rows; the target is filtered on
+    them with literals, so only those partitions are scanned.
+    """
+
+    columns = [f"`{field['name']}`" for field in schema]
+    partition = ", ".join(f"`{name}`" for name in key)
+    on = " AND ".join(f"T.`{name}` = S.`{name}`" for name in key)
+    dates = sorted(str(day) for day in dates or () if day is not None)
+    if dates:
+        literals = ", ".join(f"DATE '{day}'" for day in dates)
+        on += f" AND T.`date` IN ({literals})"
+    update = ", ".join(f"{column} = S.{column}" for column in columns)
+
+    return f"""
+        MERGE `{_tablename(table)}` T
+        USING (
+            SELECT * FROM `{_tablename(staging)}` WHERE TRUE
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition}) = 1
+        ) S
+        ON {on}
+        WHEN MATCHED THEN UPDATE SET {update}
+        WHEN NOT MATCHED THEN INSERT ROW
+    """
+
+
+class BigQueryStreamSink(BigQuerySink):
+    """Appends rows to the fitbit dataset with the Storage Write API.
+
+    each write opens a write stream on the table and appends the rows
+    as arrow record batches of at most ``MAX_APPEND_BYTES``, each at the
+    offset of its first row, so an append retried by the client is not
+    written twice.
+
+    with `pending` streams the rows only become visible when the stream
+    is committed, after the last append: a write is loaded entirely or
+    not at all.  with `committed` streams rows are visible as soon as
+    they are appended, and a failed write may leave the batches appended
+    before the failure.
+
+    as with load jobs, the table is created the first time it is written
+    to, see ``BigQuerySink.create_table``.  upserts go through a staging
+    table loaded with a load job, as with ``BigQuerySink``.
+    """
+
+    def __init__(self, project_id=None, stream_type=stream_type):
+
+        super().__init__(project_id)
+        self.stream_type = stream_type
+        self._write_client = None
+
+    @property
+    def write_client(self):
+
+        if self._write_client is None:
+            self._write_client = bigquery_storage_v1.BigQueryWriteClient()
+        return self._write_client
+
+    def write(self, table, data, schema, key=None):
+        """append the rows of data to table, created with schema if needed
+
+        with key, upsert the rows on the key columns instead.
+        """
+
+        arrow_table = _as_arrow(data, schema)
+
+        if key:
+            self._upsert(table, arrow_table, schema, key)
+            return
+
+        if not arrow_table.num_rows:
+            return
+
+        self.create_table(table, schema)
+
+        parent = self.write_client.table_path(
+            self.client.project, bigquery_datasetname, table
+        )
+        if self.stream_type == "committed":
+            type_ = types.WriteStream.Type.COMMITTED
+        else:
+            type_ = types.WriteStream.Type.PENDING
+        write_stream = self.write_client.create_write_stream(
+            parent=parent, write_stream=types.WriteStream(type_=type_)
+        )
+
+        template = types.AppendRowsRequest(write_stream=write_stream.name)
+        template.arrow_rows.writer_schema.serialized_schema = (
+            arrow_table.schema.serialize().to_pybytes()
+        )
+        stream = writer.AppendRowsStream(self.write_client, template)
+
+        rows = arrow_table.num_rows
+        rows_per_append = max(
+            1, rows * MAX_APPEND_BYTES // max(arrow_table.nbytes, 1)
+        )
+
+        try:
+            futures = []
+            offset = 0
+            for batch in arrow_table.to_batches(max_chunksize=rows_per_append):
+                request = types.AppendRowsRequest(offset=offset)
+                request.arrow_rows.rows.serialized_record_batch = (
+                    batch.serialize().to_pybytes()
+                )
+                futures.append(stream.send(request))
+                offset += batch.num_rows
+
+            for future in futures:
+                future.result()
+        finally:
+            stream.close()
+
+        self.write_client.finalize_write_stream(name=write_stream.name)
+
+        if self.stream_type != "committed":
+            response = self.write_client.batch_commit_write_streams(
+                types.BatchCommitWriteStreamsRequest(
+                    parent=parent, write_streams=[write_stream.name]
+                )
+            )
+            if response.stream_errors:
+                raise RuntimeError(
+                    f"{table}: commit failed: {response.stream_errors}"
+                )
+
+
+class DuckDBSink:
+    """Writes tables to a local DuckDB database.
+
+    Examples of use::
+
+        sink = DuckDBSink("fitbit.duckdb")
+        sink.write("intraday_steps", df, INTRADAY_STEPS_TABLE_SCHEMA)
+
+        # later, from python or the duckdb cli
+        duckdb.connect("fitbit.duckdb").sql("SELECT * FROM intraday_steps")
+
+    tables are created from their BigQuery schema (see ``DUCKDB_TYPES``)
+    and the rows inserted straight from the pyarrow Table.  an upsert
+    deletes the rows matching the keys of data and inserts data, in one
+    transaction.  DuckDB allows one writer process per database file,
+    writes from several threads take turns.
+
+    duckdb is only imported when the sink is first written to.
+    """
+
+    def __init__(self, path=None):
+
+        self.path = path or duckdb_path
+        self._connection = None
+        self._created = set()
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+
+        if self._connection is None:
+            import duckdb
+
+            self._connection = duckdb.connect(self.path)
+        return self._connection
+
+    def write(self, table, data, schema, key=None):
+        """append the rows of data to table, created with schema if needed
+
+        with key, upsert the rows on the key columns instead.
+        """
+
+        arrow_table = _as_arrow(data, schema)
+        if not arrow_table.num_rows:
+            return
+
+        with self._lock:
+            self.create_table(table, schema)
+
+            cursor = self.connection.cursor()
+            cursor.register("rows", arrow_table)
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                if key:
+                    partition = ", ".join(f'"{name}"' for name in key)
+                    on = " AND ".join(
+                        f'"{table}"."{name}" = rows."{name}"' for name in key
+                    )
+                    cursor.execute(
+                        f'DELETE FROM "{table}" USING rows WHERE {on}'
+                    )
+                    cursor.execute(
+                        f"""
+                        INSERT INTO "{table}"
+                        SELECT * FROM rows WHERE TRUE
+                        QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition}) = 1
+                        """
+                    )
+                else:
+                    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM rows')
+                cursor.execute("COMMIT")
+            except (Exception):
+                cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.close()
+
+    def create_table(self, table, schema):
+        """create table with schema unless it exists"""
+
+        if table in self._created:
+            return
+
+        columns = ", ".join(
+            f'"{field["name"]}" {DUCKDB_TYPES[field["type"]]}'
+            for field in schema
+        )
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" ({columns})'
+        )
+        self._created.add(table)
+
+
+class ParquetLakeSink:
+    """Exports tables to a hive-partitioned parquet lake.
+
+    each write adds zstd compressed parquet files under::
+
+        <path>/<table>/date=<date>/user_bucket=<n>/part-<uuid>-<i>.parquet
+
+    where n is a stable hash of the user `id` modulo buckets, so that a
+    user's rows always land in the same bucket.  path is a local
+    directory or any uri pyarrow has a filesystem for (`gs://`, `s3://`).
+    read it back with e.g.::
+
+        pyarrow.dataset.dataset(
+            "lake/intraday_steps", format="parquet", partitioning="hive"
+        ).to_table(filter=pc.field("date") == "2023-05-01")
+
+    the lake is an export: rows are always appended, an upsert key is
+    ignored and readers deduplicate on it if needed.
+    """
+
+    def __init__(self, path=None, buckets=None):
+
+        path = path or lake_path
+        if "://" not in path:
+            path = os.path.abspath(path)
+
+        self.filesystem, self.path = fs.FileSystem.from_uri(path)
+        self.buckets = buckets or lake_buckets
+        self.file_options = ds.ParquetFileFormat().make_write_options(
+            compression="zstd"
+        )
+
+    def write(self, table, data, schema, key=None):
+        """export the rows of data to the lake"""
+
+        arrow_table = _as_arrow(data, schema)
+        if not arrow_table.num_rows:
+            return
+
+        arrow_table = arrow_table.append_column(
+            "user_bucket", self._buckets(arrow_table["id"])
+        )
+
+        ds.write_dataset(
+            arrow_table,
+            f"{self.path}/{table}",
+            filesystem=self.filesystem,
+            format="parquet",
+            file_options=self.file_options,
+            partitioning=["date", "user_bucket"],
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def create_table(self, table, schema):
+        """nothing to create, directories appear with their first file"""
+
+    def _buckets(self, ids):
+
+        # hash each distinct id once, crc32 is stable across processes
+        encoded = pc.dictionary_encode(ids).combine_chunks()
+        buckets = pa.array(
+            [
+                zlib.crc32(str(user).encode()) % self.buckets
+                for user in encoded.dictionary.to_pylist()
+            ],
+            type=pa.int32(),
+        )
+        return buckets.take(encoded.indices)
+
+
+class TeeSink:
+    """Writes to a sink and exports the same rows to secondary sinks.
+
+    the primary sink decides whether a write failed, errors of the
+    secondary sinks are only logged.
+    """
+
+    def __init__(self, sink, secondary):
+
+        self.sink = sink
+        self.secondary = secondary
+
+    def write(self, table, data, schema, key=None):
+
+        # convert DataFrames once for all the sinks
+        data = _as_arrow(data, schema)
+        self.sink.write(table, data, schema, key)
+
+        for sink in self.secondary:
+            try:
+                sink.write(table, data, schema, key)
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
+
+    def create_table(self, table, schema):
+
+        self.sink.create_table(table, schema)
+
+
+def make_sink(name=None):
+    """the sink named by `INGEST_SINK` (or name)
+
+    wrapped in a ``TeeSink`` exporting to the parquet lake when
+    `INGEST_LAKE_PATH` is set.
+    """
+
+    name = name or ingest_sink
+    if name == "bigquery_stream":
+        sink = BigQueryStreamSink()
+    elif name == "duckdb":
+        sink = DuckDBSink()
+    else:
+        sink = BigQuerySink()
+
+    if lake_path:
+        sink = TeeSink(sink, [ParquetLakeSink()])
+    return sink
+
+
+class Uploader:
+    """Writes to a sink from background threads.
+
+    Examples of use::
+
+        uploader = Uploader(BigQuerySink())
+
+        # returns once the table is queued
+        uploader.write("intraday_steps", df, INTRADAY_STEPS_TABLE_SCHEMA)
+        ...
+        # waits for the queued uploads
+        uploader.join()
+
+    max_workers uploads run at once.  at most max_pending tables wait in
+    the queue, a write beyond that blocks until an upload is done, which
+    bounds the memory held by the queue.  upload errors are logged, as
+    with a failed write of ``BufferedTable``, and counted per table in
+    ``errors``.
+    """
+
+    def __init__(self, sink, max_workers=None, max_pending=None):
+
+        self.sink = sink
+        self.max_workers = max_workers or upload_workers
+        self.queue = queue.Queue(maxsize=max_pending or upload_queue)
+        self.threads = []
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def write(self, table, data, schema, key=None):
+        """queue data to be appended (or with key, upserted) to table"""
+
+        if not self.threads:
+            for _ in range(self.max_workers):
+                thread = threading.Thread(target=self._run, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+        self.queue.put((table, data, schema, key))
+
+    def join(self):
+        """wait until all queued tables are written"""
+
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def _run(self):
+
+        while True:
+
+            item = self.queue.get()
+            if item is None:
+                return
+
+            table, data, schema, key = item
+            try:
+                self.sink.write(table, data, schema, key)
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
+                with self._lock:
+                    self.errors[table] = self.errors.get(table, 0) + 1
+
+
+class BufferedTable(TableBuilder):
+    """TableBuilder that writes its rows out once the buffer is full.
+
+    whenever an append takes the buffer past max_rows rows or max_bytes
+    bytes, the buffered rows are written to the sink (or spilled to a
+    parquet file in spill_dir) and the buffer starts over.  ``flush``
+    writes out spilled files and the rows still buffered, and has to be
+    called once all rows are appended.
+
+    engine picks how the buffer is written out: a DataFrame (`pandas`)
+    or a pyarrow Table with the types of schema (`arrow`).  tables
+    buffered in long form give pivot, the key and values passed to
+    ``TableBuilder.pivot``, and are pivoted to wide rows when written.
+    key is the natural key of the table, its rows are upserted on it
+    when `INGEST_LOAD_MODE` is `upsert`.
+
+    write errors are logged and the rows dropped, the same as a failed
+    upload at the end of a route, and counted in ``errors``.
+    """
+
+    def __init__(
+        self,
+        table,
+        schema,
+        sink=None,
+        max_rows=None,
+        max_bytes=None,
+        spill_dir=spill_dir,
+        engine=None,
+        pivot=None,
+        key=None,
+        **kwargs,
+    ):
+
+        if pivot:
+            kwargs.setdefault("categorical", ("id", "date", pivot[0]))
+        super().__init__(**kwargs)
+
+        self.table = table
+        self.schema = schema
+        self.sink = sink or make_sink()
+        self.max_rows = max_rows or flush_rows
+        self.max_bytes = max_bytes or flush_bytes
+        self.spill_dir = spill_dir
+        self.spilled = []
+        self.engine = engine or ingest_engine
+        self.pivot_spec = pivot
+        self.key = key if load_mode == "upsert" else None
+        self.errors = 0
+        if self.engine == "arrow":
+            self.arrow_schema = arrow_schema(schema)
+
+    def append(self, columns, count):
+
+        super().append(columns, count)
+
+        if self.rows >= self.max_rows or self.nbytes >= self.max_bytes:
+            self._flush_buffer(spill=self.spill_dir is not None)
+
+    def flush(self):
+        """write out all spilled and buffered rows"""
+
+        for path in self.spilled:
+            try:
+                if self.engine == "arrow":
+                    self._write(pq.read_table(path))
+                else:
+                    self._write(pd.read_parquet(path))
+                os.remove(path)
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
+                self.errors += 1
+        self.spilled = []
+
+        self._flush_buffer(spill=False)
+
+    def _flush_buffer(self, spill):
+
+        if not self.rows:
+            return
+
+        rows = self.rows
+        try:
+            builder = self.pivot(*self.pivot_spec) if self.pivot_spec else self
+            if self.engine == "arrow":
+                data = builder.to_arrow(self.arrow_schema)
+            else:
+                data = builder.to_frame()
+        except (Exception) as e:
+            log.error("exception occured: %s", str(e))
+            self.errors += 1
+            self.clear()
+            return
+        self.clear()
+
+        if spill:
+            path = os.path.join(
+                self.spill_dir, f"{self.table}-{uuid.uuid4().hex}.parquet"
+            )
+            log.debug("%s: spilling %d rows to %s", self.table, rows, path)
+            try:
+                if self.engine == "arrow":
+                    pq.write_table(data, path)
+                else:
+                    data.to_parquet(path)
+                self.spilled.append(path)
+                return
+            except (Exception) as e:
+                log.error("exception occured: %s", str(e))
+
+        self._write(data)
+
+    def _write(self, data):
+
+        log.debug("%s: writing %d rows", self.table, len(data))
+
+        try:
+            self.sink.write(self.table, data, self.schema, self.key)
+        except (Exception) as e:
+            log.error("exception occured: %s", str(e))
+            self.errors += 1
@@ -0,0 +1,120 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Process pool for the table transforms of the ingestion engine.
+
+the json responses of a scope are turned into rows by the ``TableSpec``
+entries of ``app.fitbit_registry``.  for the intraday scopes that is
+most of the cpu time of a route, and within one process it all runs
+under the same GIL whatever the number of gunicorn threads.
+
+when `INGEST_TRANSFORM_WORKERS` is set, the engine hands each response
+to a pool of worker processes instead.  a worker builds the rows of the
+requested tables and sends them back as an Arrow IPC stream, which the
+route appends to its ``BufferedTable`` column by column (see
+``TableBuilder.append_arrow``), without going through a DataFrame.
+
+workers only import the registry and the transforms, not the routes:
+they do not create the firebase client or the oauth blueprints.
+
+Example::
+
+    future = transform_pool().submit(
+        transform_tables, "intraday", ["intraday_steps"], payload, user, date
+    )
+    for name, data in future.result().items():
+        append_result(tables[name], data)
+
+Configuration:
+
+    * `INGEST_TRANSFORM_WORKERS`: optional, number of worker processes
+        transforming responses.  defaults to 0, responses are transformed
+        in the thread of the route.
+"""
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+
+from .fitbit_registry import SCOPES
+from .fitbit_transform import TableBuilder
+
+
+log = logging.getLogger(__name__)
+
+# worker processes for the transforms, 0 to transform in the route
+transform_workers = int(os.environ.get("INGEST_TRANSFORM_WORKERS", 0))
+
+_pool = None
+
+
+def transform_pool():
+    """the shared ProcessPoolExecutor, None if transforms run inline
+
+    workers are spawned rather than forked, the routes run in threads
+    and a forked child would inherit their locks.
+    """
+
+    global _pool
+
+    if transform_workers > 0 and _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=transform_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def transform_tables(scope, tables, payload, email, date_pulled):
+    """rows of the named tables of scope from one response
+
+    runs in a worker process.  returns a dict of table name to an Arrow
+    IPC buffer, or to a DataFrame for rows arrow cannot encode (object
+    columns mixing types), see ``append_result``.
+    """
+
+    results = {}
+
+    for table in SCOPES[scope].tables:
+
+        if table.table not in tables:
+            continue
+
+        builder = TableBuilder()
+        table.append(builder, payload, email, date_pulled)
+        if not len(builder):
+            continue
+
+        df = builder.to_frame()
+        try:
+            sink = pa.BufferOutputStream()
+            arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+            results[table.table] = sink.getvalue()
+        except (pa.ArrowException):
+            results[table.table] = df
+
+    return results
+
+
+def append_result(builder, data):
+    """append rows returned by ``transform_tables`` to builder"""
+
+    if isinstance(data, pa.Buffer):
+        builder.append_arrow(pa.ipc.open_stream(data).read_all())
+    else:
+        builder.append_frame(data)
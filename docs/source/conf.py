@@ -60,7 +60,6 @@ extensions = [
 
 autodoc_mock_imports = [
     "flask_login",
-    "pandas_gbq",
     "skimpy",
     "flask_dance",
     "firebase_admin",
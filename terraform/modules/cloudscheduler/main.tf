@@ -115,7 +115,8 @@ resource "google_cloud_scheduler_job" "fitbit_data_pull" {
 
   name             = "fitbit_data_pull"
   description      = "Pull user Fitbit data"
-  schedule         = "40 13 * * *"
+  # runs first, other scopes use the device sync times it caches
+  schedule         = "25 13 * * *"
   time_zone        = "America/New_York"
   attempt_deadline = "320s"
 